@@ -0,0 +1,116 @@
+"""
+Measures the peak memory and the time of decoding a submission downloaded by
+nbgrader collect, parsing the whole response as before and streaming it with
+ngshare_exchange.json_stream.decode_files, for synthetic submissions of a
+single file of the given sizes in MiB. The content is encoded both with
+base64.encodebytes, as by the ngshare server, which breaks lines every 76
+characters, and with base64.b64encode.
+
+Usage: python benchmarks/collect_memory.py [SIZE ...]
+"""
+import argparse
+import base64
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from ngshare_exchange.exchange import STREAM_CHUNK_SIZE
+from ngshare_exchange.json_stream import decode_files
+
+DEFAULT_SIZES = [16, 64, 256]
+ENCODINGS = [base64.encodebytes, base64.b64encode]
+
+
+def make_response(path, size, encode):
+    """
+    Writes an ngshare submission response with a file of ``size`` MiB,
+    encoded with ``encode``, to ``path``.
+    """
+    content = encode(os.urandom(size << 20)).decode()
+    with open(path, 'w') as f:
+        json.dump(
+            {
+                'success': True,
+                'timestamp': '2020-01-01 00:00:00.000000 UTC',
+                'files': [{'path': 'notebook.ipynb', 'content': content}],
+            },
+            f,
+        )
+
+
+def read_chunks(path):
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(STREAM_CHUNK_SIZE), b'')
+
+
+def parse_whole(path, dest_dir):
+    """
+    The decoding used before: the response is read and parsed as a whole
+    and every file is decoded in memory.
+    """
+    response = json.loads(b''.join(read_chunks(path)))
+    for entry in response['files']:
+        with open(os.path.join(dest_dir, entry['path']), 'wb') as f:
+            f.write(base64.b64decode(entry['content']))
+
+
+def parse_streamed(path, dest_dir):
+    decode_files(read_chunks(path), dest_dir)
+
+
+def measure(func, path):
+    """
+    Returns the peak memory in bytes allocated while ``func`` decodes the
+    response at ``path``.
+    """
+    with tempfile.TemporaryDirectory() as dest_dir:
+        tracemalloc.start()
+        try:
+            func(path, dest_dir)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+def measure_time(func, path):
+    """
+    Returns the seconds ``func`` takes to decode the response at ``path``.
+    """
+    with tempfile.TemporaryDirectory() as dest_dir:
+        start = time.perf_counter()
+        func(path, dest_dir)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('sizes', nargs='*', type=int, default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    print(
+        '| Submission | Content | Memory parsed as a whole | Memory streamed '
+        '| Time parsed as a whole | Time streamed |'
+    )
+    print('| ---: | --- | ---: | ---: | ---: | ---: |')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'response.json')
+        for size in args.sizes:
+            for encode in ENCODINGS:
+                make_response(path, size, encode)
+                print(
+                    '| {} MiB | {} | {:.1f} MiB | {:.2f} MiB | {:.2f} s '
+                    '| {:.2f} s |'.format(
+                        size,
+                        encode.__name__,
+                        measure(parse_whole, path) / 2**20,
+                        measure(parse_streamed, path) / 2**20,
+                        measure_time(parse_whole, path),
+                        measure_time(parse_streamed, path),
+                    )
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures how long importing ngshare_exchange modules takes, using
+``python -X importtime`` in a fresh interpreter for every run.
+
+Usage: python benchmarks/import_time.py [-n RUNS] [statement ...]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+DEFAULT_STATEMENTS = [
+    'import ngshare_exchange',
+    'import ngshare_exchange.course_management',
+    'from ngshare_exchange import ExchangeList',
+    'import ngshare_exchange; ngshare_exchange.configureExchange',
+]
+
+# Dependencies whose import cost is reported separately.
+DEPENDENCIES = ['nbgrader', 'requests', 'rapidfuzz', 'jupyter_core']
+
+
+def measure(statement):
+    """
+    Returns the total import time of ``statement`` in microseconds and a
+    dictionary with the cumulative import time of each of the DEPENDENCIES
+    that was imported.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    total = 0
+    dependencies = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:') :].split('|')
+        if not name.startswith('  '):
+            total += int(cumulative)
+        if name.strip() in DEPENDENCIES:
+            dependencies[name.strip()] = int(cumulative)
+    return total, dependencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--runs', type=int, default=5)
+    parser.add_argument('statements', nargs='*', default=DEFAULT_STATEMENTS)
+    args = parser.parse_args()
+
+    print('| Statement | Median import time | Dependencies imported |')
+    print('| --- | ---: | --- |')
+    for statement in args.statements:
+        runs = [measure(statement) for _ in range(args.runs)]
+        median = statistics.median(total for total, _ in runs)
+        dependencies = ', '.join(
+            '{} ({:.0f} ms)'.format(name, cumulative / 1000)
+            for name, cumulative in runs[-1][1].items()
+        )
+        print(
+            '| `{}` | {:.0f} ms | {} |'.format(
+                statement, median / 1000, dependencies or '-'
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Measures how long ExchangeList.parse_assignments takes to group submissions
+by course, student and assignment, for synthetic lists of submissions with
+a few submissions per student. Each size is timed on the shuffled
+submissions and on the same submissions already in group order, with
+timeit (best of RUNS, garbage collection disabled).
+
+Usage: python benchmarks/list_grouping.py [-r RUNS] [--compare] [SIZE ...]
+"""
+import argparse
+import random
+import timeit
+
+from ngshare_exchange.list import _group_key, _group_submissions
+
+DEFAULT_SIZES = [10000, 100000]
+SUBMISSIONS_PER_STUDENT = 4
+
+
+def group_submissions_by_scan(assignments):
+    """
+    The grouping used before, which scans all submissions for every group.
+    """
+    _get_key = lambda info: (
+        info['course_id'],
+        info['student_id'],
+        info['assignment_id'],
+    )
+    _match_key = lambda info, key: (
+        info['course_id'] == key[0]
+        and info['student_id'] == key[1]
+        and info['assignment_id'] == key[2]
+    )
+    assignment_keys = sorted(
+        list(set([_get_key(info) for info in assignments]))
+    )
+    assignment_submissions = []
+    for key in assignment_keys:
+        submissions = [x for x in assignments if _match_key(x, key)]
+        submissions = sorted(submissions, key=lambda x: x['timestamp'])
+        info = {
+            'course_id': key[0],
+            'student_id': key[1],
+            'assignment_id': key[2],
+            'status': submissions[0]['status'],
+            'submissions': submissions,
+        }
+        assignment_submissions.append(info)
+    return assignment_submissions
+
+
+def make_submissions(size, seed=0):
+    rng = random.Random(seed)
+    submissions = []
+    for i in range(size):
+        group = i // SUBMISSIONS_PER_STUDENT
+        submissions.append(
+            {
+                'course_id': 'course{}'.format(group % 3),
+                'student_id': 'student{}'.format(group // 30),
+                'assignment_id': 'ps{}'.format(group // 3 % 10),
+                'timestamp': '2020-01-01 00:00:{:06d} UTC'.format(
+                    rng.randrange(1000000)
+                ),
+                'status': 'submitted',
+            }
+        )
+    rng.shuffle(submissions)
+    return submissions
+
+
+def measure(func, submissions, runs):
+    # timeit disables garbage collection while timing.
+    return min(timeit.repeat(lambda: func(submissions), number=1, repeat=runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-r', '--runs', type=int, default=5)
+    parser.add_argument(
+        '--compare',
+        action='store_true',
+        help='also time the previous grouping (quadratic, slow above 10k)',
+    )
+    parser.add_argument('sizes', nargs='*', type=int, default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    header = (
+        '| Submissions | Groups | Indexed grouping | µs / submission '
+        '| µs / submission in group order |'
+    )
+    separator = '| ---: | ---: | ---: | ---: | ---: |'
+    if args.compare:
+        header += ' Scanning grouping |'
+        separator += ' ---: |'
+    print(header)
+    print(separator)
+    for size in args.sizes:
+        submissions = make_submissions(size)
+        groups = _group_submissions(submissions)
+        if args.compare:
+            assert groups == group_submissions_by_scan(submissions)
+        duration = measure(_group_submissions, submissions, args.runs)
+        ordered = measure(
+            _group_submissions, sorted(submissions, key=_group_key), args.runs
+        )
+        row = '| {} | {} | {:.1f} ms | {:.2f} | {:.2f} |'.format(
+            size,
+            len(groups),
+            duration * 1000,
+            duration * 1e6 / size,
+            ordered * 1e6 / size,
+        )
+        if args.compare:
+            duration = measure(group_submissions_by_scan, submissions, 1)
+            row += ' {:.1f} ms |'.format(duration * 1000)
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
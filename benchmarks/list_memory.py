@@ -0,0 +1,143 @@
+"""
+Measures the memory taken by the inbound submissions ExchangeList keeps
+while listing, as the dictionaries used before and as the slotted records
+used now, for synthetic ngshare responses with a few submissions per student.
+
+Usage: python benchmarks/list_memory.py [SIZE ...]
+"""
+import argparse
+import gc
+import hashlib
+import json
+import tracemalloc
+
+from ngshare_exchange.list import (
+    _merge_notebooks_feedback,
+    _parse_notebook_id,
+    _Submission,
+)
+
+DEFAULT_SIZES = [10000, 100000]
+SUBMISSIONS_PER_STUDENT = 4
+NOTEBOOKS = 3
+
+
+def make_responses(size):
+    """
+    Returns the decoded ngshare responses listing the submissions and, for
+    every submission, its notebooks and feedback, as (course_id,
+    assignment_id, submission, files, feedback) tuples.
+    """
+    responses = []
+    for i in range(size):
+        group = i // SUBMISSIONS_PER_STUDENT
+        course_id = 'course{}'.format(group % 3)
+        assignment_id = 'ps{}'.format(group // 3 % 10)
+        submission = {
+            'student_id': 'student{}'.format(group // 30),
+            'timestamp': '2020-01-01 00:00:{:06d} UTC'.format(i),
+        }
+        files = [
+            {'path': 'notebook{}.ipynb'.format(j)} for j in range(NOTEBOOKS)
+        ]
+        feedback = [
+            {
+                'path': 'notebook{}.html'.format(j),
+                'checksum': hashlib.md5(
+                    '{}-{}'.format(i, j).encode()
+                ).hexdigest(),
+            }
+            for j in range(NOTEBOOKS)
+        ]
+        # Decoded from JSON, so that no strings are shared between responses.
+        responses.append(
+            json.loads(
+                json.dumps(
+                    [course_id, assignment_id, submission, files, feedback]
+                )
+            )
+        )
+    return responses
+
+
+def as_dicts(course_id, assignment_id, submission, notebook_ids, checksums):
+    """
+    The submissions kept before, as nested dictionaries.
+    """
+    return {
+        'course_id': course_id,
+        'assignment_id': assignment_id,
+        'student_id': submission['student_id'],
+        'timestamp': submission['timestamp'],
+        'notebooks': [
+            {'notebook_id': x, 'feedback_checksum': checksums.get(x)}
+            for x in notebook_ids
+        ],
+    }
+
+
+def as_records(course_id, assignment_id, submission, notebook_ids, checksums):
+    return _Submission(
+        course_id,
+        assignment_id,
+        submission['student_id'],
+        submission['timestamp'],
+        _merge_notebooks_feedback(notebook_ids, checksums),
+    )
+
+
+def measure(func, responses):
+    """
+    Returns the memory in bytes allocated by ``func`` for all responses and
+    still in use afterwards.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        submissions = []
+        for course_id, assignment_id, submission, files, feedback in responses:
+            # Parsed as in ExchangeList._get_submission_notebooks and
+            # ExchangeList._get_feedback_checksums.
+            notebook_ids = [_parse_notebook_id(x['path']) for x in files]
+            checksums = {
+                _parse_notebook_id(x['path'], '.html'): x['checksum']
+                for x in feedback
+            }
+            submissions.append(
+                func(
+                    course_id,
+                    assignment_id,
+                    submission,
+                    notebook_ids,
+                    checksums,
+                )
+            )
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('sizes', nargs='*', type=int, default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    print('| Submissions | Dictionaries | Records | Saved |')
+    print('| ---: | ---: | ---: | ---: |')
+    for size in args.sizes:
+        responses = make_responses(size)
+        dicts = measure(as_dicts, responses)
+        records = measure(as_records, responses)
+        print(
+            '| {} | {:.1f} MiB | {:.1f} MiB | {:.0f} % |'.format(
+                size,
+                dicts / 2**20,
+                records / 2**20,
+                (1 - records / dicts) * 100,
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
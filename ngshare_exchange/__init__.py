@@ -1,13 +1,35 @@
-from .exchange import Exchange
-from .submit import ExchangeSubmit
-from .release_feedback import ExchangeReleaseFeedback
-from .release_assignment import ExchangeReleaseAssignment
-from .fetch_feedback import ExchangeFetchFeedback
-from .fetch_assignment import ExchangeFetchAssignment
-from .collect import ExchangeCollect
-from .list import ExchangeList
+from importlib import import_module
+
 from .version import __version__
-from .configure_exchange import configureExchange
+
+# The exchange classes are imported on first access, so that importing this
+# package (e.g. for ngshare-course-management) does not load nbgrader.
+_lazy_imports = {
+    "Exchange": ".exchange",
+    "ExchangeCollect": ".collect",
+    "ExchangeFetchAssignment": ".fetch_assignment",
+    "ExchangeFetchFeedback": ".fetch_feedback",
+    "ExchangeList": ".list",
+    "ExchangeReleaseAssignment": ".release_assignment",
+    "ExchangeReleaseFeedback": ".release_feedback",
+    "ExchangeSubmit": ".submit",
+    "configureExchange": ".configure_exchange",
+}
+
+
+def __getattr__(name):
+    if name not in _lazy_imports:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name)
+        )
+    value = getattr(import_module(_lazy_imports[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_imports))
+
 
 __all__ = [
     "Exchange",
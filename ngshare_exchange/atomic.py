@@ -0,0 +1,55 @@
+import os
+import stat
+import uuid
+from contextlib import contextmanager
+
+
+def _create_temporary(path):
+    """
+    Creates a new file next to ``path`` and returns its descriptor and path.
+    The file gets the mode of ``path`` if it exists, or else the default
+    mode of new files under the umask.
+    """
+    head, name = os.path.split(path)
+    while True:
+        tmp_path = os.path.join(
+            head, '.{}.{}.tmp'.format(name, uuid.uuid4().hex)
+        )
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            continue
+        break
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return fd, tmp_path
+    try:
+        os.chmod(tmp_path, mode)
+    except BaseException:
+        os.close(fd)
+        os.remove(tmp_path)
+        raise
+    return fd, tmp_path
+
+
+@contextmanager
+def atomic_write(path, mode='w'):
+    """
+    Opens a new temporary file in the directory of ``path``, which replaces
+    the file at ``path`` when the block completes. Readers never see a
+    partially written file, and concurrent writers never share a temporary
+    file. If the block raises, the temporary file is removed and ``path`` is
+    left unchanged.
+    """
+    fd, tmp_path = _create_temporary(path)
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,255 @@
+import json
+import os
+import sqlite3
+import time
+
+from .checksums import _RACY_SECONDS
+
+# Bumped whenever the schema changes, which makes existing indexes rebuild.
+SCHEMA_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE courses (
+    course_id TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE submissions (
+    course_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    student_id TEXT NOT NULL,
+    assignment_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    notebooks TEXT NOT NULL,
+    PRIMARY KEY (course_id, name)
+);
+CREATE INDEX submissions_assignment ON submissions (course_id, assignment_id);
+'''
+
+
+def _parse_name(name):
+    """
+    Returns the student_id, assignment_id and timestamp of the name of a
+    cached submission, or None if it is not one.
+    """
+    parts = name.split('+')
+    if len(parts) != 3:
+        return None
+    return parts
+
+
+def _submission_names(course_dir):
+    with os.scandir(course_dir) as entries:
+        return {
+            entry.name
+            for entry in entries
+            if entry.is_dir()
+            and not entry.name.startswith('.')
+            and _parse_name(entry.name) is not None
+        }
+
+
+def _is_racy(mtime_ns):
+    """
+    Returns whether a directory modified at ``mtime_ns`` may still change
+    without changing its modification time.
+    """
+    return mtime_ns >= (time.time() - _RACY_SECONDS) * 1e9
+
+
+def _list_notebooks(path):
+    with os.scandir(path) as entries:
+        return sorted(
+            entry.name
+            for entry in entries
+            if entry.name.endswith('.ipynb') and not entry.name.startswith('.')
+        )
+
+
+class CacheIndex:
+    """
+    SQLite index of the submissions in the local submission cache, i.e. of
+    the directories ``<cache>/<course_id>/<student_id>+<assignment_id>+
+    <timestamp>`` and the notebooks in them.
+
+    The submissions of a course are indexed again whenever the modification
+    time of the course directory changes, i.e. whenever a submission is
+    added, removed or renamed outside of ``add``, and while it is too recent
+    to be trusted, as in ChecksumCache. Cached submissions are not modified
+    after they are created, so the notebooks of submissions that are already
+    indexed are not listed again.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, '.index.sqlite3')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != SCHEMA_VERSION:
+                with conn:
+                    conn.execute('DROP TABLE IF EXISTS courses')
+                    conn.execute('DROP TABLE IF EXISTS submissions')
+                    conn.executescript(SCHEMA)
+                    conn.execute(
+                        'PRAGMA user_version = {}'.format(SCHEMA_VERSION)
+                    )
+        except sqlite3.DatabaseError:
+            conn.close()
+            raise
+        return conn
+
+    def _course_ids(self):
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                return sorted(
+                    entry.name
+                    for entry in entries
+                    if entry.is_dir() and not entry.name.startswith('.')
+                )
+        except FileNotFoundError:
+            return []
+
+    def _refresh_course(self, conn, course_id):
+        """
+        Indexes the submissions of a course again if its directory changed.
+        """
+        course_dir = os.path.join(self.cache_dir, course_id)
+        try:
+            mtime_ns = os.stat(course_dir).st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+        row = conn.execute(
+            'SELECT mtime_ns FROM courses WHERE course_id = ?', (course_id,)
+        ).fetchone()
+        if row is not None and row[0] == mtime_ns:
+            return
+        if mtime_ns is None:
+            conn.execute(
+                'DELETE FROM submissions WHERE course_id = ?', (course_id,)
+            )
+            conn.execute(
+                'DELETE FROM courses WHERE course_id = ?', (course_id,)
+            )
+            return
+
+        indexed = {
+            name
+            for name, in conn.execute(
+                'SELECT name FROM submissions WHERE course_id = ?',
+                (course_id,),
+            )
+        }
+        names = _submission_names(course_dir)
+        conn.executemany(
+            'DELETE FROM submissions WHERE course_id = ? AND name = ?',
+            [(course_id, name) for name in indexed - names],
+        )
+        for name in names - indexed:
+            self._insert(conn, course_id, name)
+        self._set_course_mtime(conn, course_id, mtime_ns)
+
+    def _set_course_mtime(self, conn, course_id, mtime_ns):
+        """
+        Records that the index of a course matches its directory at
+        ``mtime_ns``, unless that modification time is racy.
+        """
+        if _is_racy(mtime_ns):
+            conn.execute(
+                'DELETE FROM courses WHERE course_id = ?', (course_id,)
+            )
+        else:
+            conn.execute(
+                'INSERT OR REPLACE INTO courses VALUES (?, ?)',
+                (course_id, mtime_ns),
+            )
+
+    def _insert(self, conn, course_id, name):
+        student_id, assignment_id, timestamp = _parse_name(name)
+        notebooks = _list_notebooks(
+            os.path.join(self.cache_dir, course_id, name)
+        )
+        conn.execute(
+            'INSERT OR REPLACE INTO submissions VALUES (?, ?, ?, ?, ?, ?)',
+            (
+                course_id,
+                name,
+                student_id,
+                assignment_id,
+                timestamp,
+                json.dumps(notebooks),
+            ),
+        )
+
+    def submissions(self, course_id='*', student_id='*', assignment_id='*'):
+        """
+        Returns the cached submissions as a list of pairs of the path of the
+        submission and the list of paths of its notebooks, sorted by path.
+        '*' matches every course, student or assignment.
+        """
+        query = (
+            'SELECT course_id, name, notebooks FROM submissions '
+            'WHERE course_id = ?'
+        )
+        params = []
+        if student_id != '*':
+            query += ' AND student_id = ?'
+            params.append(student_id)
+        if assignment_id != '*':
+            query += ' AND assignment_id = ?'
+            params.append(assignment_id)
+
+        if course_id == '*':
+            course_ids = self._course_ids()
+        else:
+            course_ids = [course_id]
+        conn = self._connect()
+        try:
+            result = []
+            with conn:
+                if course_id == '*':
+                    stale = [
+                        x
+                        for x, in conn.execute('SELECT course_id FROM courses')
+                        if x not in course_ids
+                    ]
+                    course_ids += stale
+                for x in course_ids:
+                    self._refresh_course(conn, x)
+            for x in course_ids:
+                for row in conn.execute(query, [x] + params):
+                    path = os.path.join(self.cache_dir, row[0], row[1])
+                    notebooks = [
+                        os.path.join(path, notebook)
+                        for notebook in json.loads(row[2])
+                    ]
+                    result.append((path, notebooks))
+        finally:
+            conn.close()
+        return sorted(result)
+
+    def add(self, course_id, path):
+        """
+        Adds the submission that has just been cached at ``path``.
+        """
+        name = os.path.basename(path)
+        course_dir = os.path.join(self.cache_dir, course_id)
+        conn = self._connect()
+        try:
+            with conn:
+                self._insert(conn, course_id, name)
+                # The index of the course stays valid if the new submission
+                # is the only change to the course directory.
+                indexed = {
+                    x
+                    for x, in conn.execute(
+                        'SELECT name FROM submissions WHERE course_id = ?',
+                        (course_id,),
+                    )
+                }
+                mtime_ns = os.stat(course_dir).st_mtime_ns
+                if _submission_names(course_dir) == indexed:
+                    self._set_course_mtime(conn, course_id, mtime_ns)
+        finally:
+            conn.close()
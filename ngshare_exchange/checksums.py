@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .atomic import atomic_write
+
+# Files modified less than this many seconds before they are hashed are not
+# cached, since a later write within the resolution of the file system's
+# timestamps would leave their size and mtime unchanged.
+_RACY_SECONDS = 2
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """
+    Returns the MD5 hex digest of the file at ``path``, read in chunks.
+    """
+    m = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            m.update(chunk)
+    return m.hexdigest()
+
+
+class ChecksumCache:
+    """
+    Cache of the MD5 checksums of local files, stored as JSON at ``path``.
+
+    Entries are keyed by the path of the file and are valid as long as the
+    size, modification time and inode of the file are unchanged, so files
+    are only read again after they have been modified or replaced.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+            if not isinstance(entries, dict):
+                entries = {}
+        except (OSError, ValueError):
+            entries = {}
+        self._entries = entries
+
+    def checksum(self, path):
+        """
+        Returns the MD5 hex digest of the file at ``path``, reading the file
+        only if it changed since its checksum was cached.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            entry = self._entries.get(path)
+        if entry is not None and entry[:3] == signature:
+            return entry[3]
+
+        checksum = file_checksum(path)
+        if stat.st_mtime_ns < (time.time() - _RACY_SECONDS) * 1e9:
+            with self._lock:
+                self._entries[path] = signature + [checksum]
+                self._dirty = True
+        return checksum
+
+    def save(self):
+        """
+        Writes the cache if it changed, dropping the entries of files that
+        no longer exist.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = {
+                path: entry
+                for path, entry in self._entries.items()
+                if os.path.exists(path)
+            }
+            self._entries = entries
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump(entries, f)
@@ -1,14 +1,92 @@
+import glob
 import os
 import shutil
+import socket
+import time
+import uuid
 from collections import defaultdict
-import base64
 
 from nbgrader.exchange.abc import ExchangeCollect as ABCExchangeCollect
-from .exchange import Exchange
+from .checksums import file_checksum
+from .exchange import Exchange, _delete_in_background, traced
+from .json_stream import decode_files
 
 from nbgrader.utils import parse_utc
 
 
+def _local_files(path):
+    """
+    Returns the paths of the files in the directory ``path`` relative to
+    it, with '/' as separator.
+    """
+    files = []
+    for root, _, names in os.walk(path):
+        rel_root = os.path.relpath(root, path)
+        for name in names:
+            rel_path = os.path.normpath(os.path.join(rel_root, name))
+            files.append(rel_path.replace(os.sep, '/'))
+    return files
+
+
+def _link_or_copy(src, dest):
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+# Staged and replaced submissions are named after the host and process
+# collecting them. Those left over by processes of this host that are not
+# running anymore are deleted by later collects, and any others once they
+# have not changed for this many seconds, since another collect may still be
+# using them.
+_LEFTOVER_SECONDS = 24 * 60 * 60
+
+
+def _owner_suffix():
+    return '{}-{}-{}'.format(
+        socket.gethostname(), os.getpid(), uuid.uuid4().hex
+    )
+
+
+def _process_alive(pid):
+    if os.name == 'nt':
+        # Signal 0 would terminate the process on Windows.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _is_abandoned(path):
+    """
+    Returns whether the staged or replaced submission at ``path`` was left
+    over by a collect that is not running anymore.
+    """
+    try:
+        ctime = os.stat(path).st_ctime
+    except OSError:
+        return False
+    if time.time() - ctime > _LEFTOVER_SECONDS:
+        return True
+    name = os.path.basename(path)
+    for marker in ('.staging-', '.old-'):
+        if marker in name:
+            owner = name.rsplit(marker, 1)[1].rsplit('-', 2)
+            break
+    else:
+        return False
+    if len(owner) != 3 or not owner[1].isdigit():
+        return False
+    host, pid, _ = owner
+    return host == socket.gethostname() and not _process_alive(int(pid))
+
+
 def groupby(l, key=lambda x: x):
     d = defaultdict(list)
     for item in l:
@@ -17,30 +95,66 @@ def groupby(l, key=lambda x: x):
 
 
 class ExchangeCollect(Exchange, ABCExchangeCollect):
-    def _get_submission(self, course_id, assignment_id, student_id):
+    # The threads deleting left over and replaced submissions.
+    _cleanup_threads = ()
+
+    @traced
+    def _get_submission(
+        self, course_id, assignment_id, student_id, dest_dir, include=None
+    ):
         """
-        Returns the student's submission. A submission is a dictionary
-        containing a 'timestamp' and 'files' list. Each file in the list is a
-        dictionary containing the 'path' relative to the assignment root and the
-        'content' as an ASCII representation of the base64 encoded bytes.
+        Downloads the student's latest submission into ``dest_dir`` and writes
+        its timestamp to timestamp.txt. The files are decoded to disk while
+        the response is read, so memory use does not grow with the size of
+        the submission. If ``include`` is given, only the files for whose
+        path it returns True are written. Returns the timestamp of the
+        submission, or None if it could not be downloaded.
         """
+        url = '/submission/{}/{}/{}'.format(
+            course_id, assignment_id, student_id
+        )
+        with self.ngshare_api_stream(url) as chunks:
+            if chunks is None:
+                return None
+            try:
+                response = decode_files(
+                    chunks, dest_dir, include, self._on_file_decoded
+                )
+            except (OSError, ValueError):
+                self.log.exception(
+                    'An error occurred downloading the submission %s', url
+                )
+                return None
+
+        if not response.get('success'):
+            self.log.error(
+                'ngshare endpoint %s returned failure: %s',
+                url,
+                response.get('message'),
+            )
+            return None
+        timestamp = response['timestamp']
+        with open(os.path.join(dest_dir, 'timestamp.txt'), 'wb') as f:
+            f.write(timestamp.encode())
+        return timestamp
+
+    def _on_file_decoded(self, path, size):
+        self.log.info('Decoding: {}'.format(path))
+        self.hooks.emit('on_file_decoded', path=path, size=size)
 
+    def _get_submission_manifest(self, course_id, assignment_id, student_id):
+        """
+        Returns the 'timestamp' and 'files' of the student's submission
+        without their content. Each file is a dictionary containing the
+        'path' relative to the assignment root and its MD5 'checksum'.
+        """
         response = self.ngshare_api_get(
-            '/submission/{}/{}/{}'.format(course_id, assignment_id, student_id)
+            '/submission/{}/{}/{}'.format(course_id, assignment_id, student_id),
+            {'list_only': 'true'},
         )
         if response is None:
-            self.log.error('An error occurred downloading a submission.')
             return None
-
-        timestamp = response['timestamp']
-        files = response['files']
-        files.append(
-            {
-                'path': 'timestamp.txt',
-                'content': base64.encodebytes(timestamp.encode()).decode(),
-            }
-        )
-        return {'timestamp': timestamp, 'files': files}
+        return {'timestamp': response['timestamp'], 'files': response['files']}
 
     def _get_submission_list(self, course_id, assignment_id):
         """
@@ -61,49 +175,131 @@ class ExchangeCollect(Exchange, ABCExchangeCollect):
             for x in response['submissions']
         ]
 
+    def _get_assignment_ids(self):
+        """
+        Returns the IDs of the assignments to collect: all assignments of the
+        course if the assignment ID is '*', or else the comma-separated IDs.
+        """
+        if self.coursedir.assignment_id == '*':
+            response = self.ngshare_api_get(
+                '/assignments/{}'.format(self.coursedir.course_id)
+            )
+            if response is None:
+                self.fail('Failed to get assignments.')
+            return response['assignments']
+        assignment_ids = self.coursedir.assignment_id.split(',')
+        return [x.strip() for x in assignment_ids if x.strip()]
+
     def _sort_by_timestamp(self, records):
         return sorted(records, key=lambda item: item['timestamp'], reverse=True)
 
+    @traced
     def init_src(self):
         if self.coursedir.course_id == '':
             self.fail('No course id specified. Re-run with --course flag.')
 
-        records = self._get_submission_list(
-            self.coursedir.course_id, self.coursedir.assignment_id
+        self.assignment_ids = self._get_assignment_ids()
+        if not self.assignment_ids:
+            self.log.warning(
+                'No assignments of course "{}" to collect'.format(
+                    self.coursedir.course_id
+                )
+            )
+        lists = self.map_concurrent(
+            lambda x: self._get_submission_list(self.coursedir.course_id, x),
+            self.assignment_ids,
         )
-        if records is None:
-            self.fail('Failed to list submissions.')
-        usergroups = groupby(records, lambda item: item['student_id'])
-        self.src_records = [
-            self._sort_by_timestamp(v)[0] for v in usergroups.values()
-        ]
+        self.src_records = []
+        for assignment_id, records in zip(self.assignment_ids, lists):
+            if records is None:
+                if len(self.assignment_ids) == 1:
+                    self.fail('Failed to list submissions.')
+                self.log.error(
+                    'Failed to list submissions of "{}".'.format(assignment_id)
+                )
+                continue
+            usergroups = groupby(records, lambda item: item['student_id'])
+            for v in usergroups.values():
+                rec = self._sort_by_timestamp(v)[0]
+                rec['assignment_id'] = assignment_id
+                self.src_records.append(rec)
 
+    @traced
     def init_dest(self):
         pass
 
+    @traced
     def copy_files(self):
-        if len(self.src_records) == 0:
+        # Submissions of all assignments are downloaded concurrently once all
+        # of them have been checked, so that the messages of each student are
+        # logged in order.
+        downloads = []
+        records = groupby(self.src_records, lambda x: x['assignment_id'])
+        for assignment_id in self.assignment_ids:
+            downloads += self._check_submissions(
+                assignment_id, records.get(assignment_id, [])
+            )
+
+        self._cleanup_threads = []
+        self._delete_leftovers()
+        self._replaced = []
+        collected = self.map_concurrent(self._collect_submission, downloads)
+        if self._replaced:
+            self._cleanup_threads.append(
+                _delete_in_background(
+                    sorted(self._replaced), 'ngshare-collect-cleanup'
+                )
+            )
+        failed = {}
+        for (student_id, assignment_id, _, _), success in zip(
+            downloads, collected
+        ):
+            if success:
+                self.submission_counts['processed'] += 1
+            else:
+                self.submission_counts['failed'] += 1
+                failed.setdefault(assignment_id, []).append(student_id)
+        for assignment_id, student_ids in failed.items():
+            self.log.error(
+                'Failed to download {} submissions of "{}" for course "{}": '
+                '{}'.format(
+                    len(student_ids),
+                    assignment_id,
+                    self.coursedir.course_id,
+                    ', '.join(student_ids),
+                )
+            )
+
+    def _check_submissions(self, assignment_id, src_records):
+        """
+        Logs whether each of the submissions of an assignment is collected,
+        updated or skipped. Returns the submissions to download, as tuples
+        of the student_id, assignment_id, destination path and whether the
+        collected submission is updated.
+        """
+        if len(src_records) == 0:
             self.log.warning(
                 'No submissions of "{}" for course "{}" to collect'.format(
-                    self.coursedir.assignment_id, self.coursedir.course_id
+                    assignment_id, self.coursedir.course_id
                 )
             )
         else:
             self.log.info(
                 'Processing {} submissions of "{}" for course "{}"'.format(
-                    len(self.src_records),
-                    self.coursedir.assignment_id,
+                    len(src_records),
+                    assignment_id,
                     self.coursedir.course_id,
                 )
             )
 
-        for rec in self.src_records:
+        downloads = []
+        for rec in src_records:
             student_id = rec['student_id']
 
             dest_path = self.coursedir.format_path(
                 self.coursedir.submitted_directory,
                 student_id,
-                self.coursedir.assignment_id,
+                assignment_id,
             )
             if not os.path.exists(os.path.dirname(dest_path)):
                 os.makedirs(os.path.dirname(dest_path))
@@ -128,40 +324,181 @@ class ExchangeCollect(Exchange, ABCExchangeCollect):
                 if updating:
                     self.log.info(
                         'Updating submission: {} {}'.format(
-                            student_id, self.coursedir.assignment_id
+                            student_id, assignment_id
                         )
                     )
-                    shutil.rmtree(dest_path)
                 else:
                     self.log.info(
                         'Collecting submission: {} {}'.format(
-                            student_id, self.coursedir.assignment_id
+                            student_id, assignment_id
                         )
                     )
-                submission = self._get_submission(
-                    self.coursedir.course_id,
-                    self.coursedir.assignment_id,
-                    student_id,
+                downloads.append(
+                    (student_id, assignment_id, dest_path, updating)
                 )
-                if submission is None:
-                    continue
-                self.do_copy(submission['files'], dest_path)
             else:
+                self.submission_counts['skipped'] += 1
                 if self.update:
                     self.log.info(
                         'No newer submission to collect: {} {}'.format(
-                            student_id, self.coursedir.assignment_id
+                            student_id, assignment_id
                         )
                     )
                 else:
                     self.log.info(
                         'Submission already exists, use --update to update: {} {}'.format(
-                            student_id, self.coursedir.assignment_id
+                            student_id, assignment_id
                         )
                     )
+        return downloads
 
-    def do_copy(self, src, dest):
+    def _collect_submission(self, download):
         """
-        Repurposed version of Exchange.do_copy.
+        Downloads the submission of a student into ``dest_path``, replacing
+        the collected one if ``updating``. Returns whether the submission
+        could be downloaded. Errors are logged, so that they do not abort
+        the collection of the other submissions.
         """
-        self.decode_dir(src, dest)
+        student_id, assignment_id, dest_path, updating = download
+        try:
+            return self._stage_submission(
+                student_id, assignment_id, dest_path, updating
+            )
+        except Exception:
+            self.log.exception(
+                'Failed to collect submission: {} {}'.format(
+                    student_id, assignment_id
+                )
+            )
+            return False
+
+    def _stage_submission(self, student_id, assignment_id, dest_path, updating):
+        """
+        Collects a submission as described in ``_collect_submission``.
+
+        The submission is written to a hidden staging directory next to
+        ``dest_path``, which is then renamed to ``dest_path``, so that
+        graders never see a partially written submission. The replaced
+        submission is deleted in the background.
+        """
+        head, name = os.path.split(dest_path)
+        suffix = _owner_suffix()
+        staging_path = os.path.join(head, '.{}.staging-{}'.format(name, suffix))
+        os.mkdir(staging_path)
+        try:
+            collected = None
+            if updating:
+                collected = self._update_submission(
+                    student_id, assignment_id, dest_path, staging_path
+                )
+            if collected is None:
+                collected = self._download_submission(
+                    student_id, assignment_id, staging_path
+                )
+            if not collected:
+                return False
+
+            if not os.path.exists(dest_path):
+                os.rename(staging_path, dest_path)
+                return True
+            old_path = os.path.join(head, '.{}.old-{}'.format(name, suffix))
+            os.rename(dest_path, old_path)
+            try:
+                os.rename(staging_path, dest_path)
+            except OSError:
+                os.rename(old_path, dest_path)
+                raise
+            self._replaced.append(old_path)
+            return True
+        finally:
+            if os.path.exists(staging_path):
+                shutil.rmtree(staging_path, ignore_errors=True)
+
+    def _download_submission(self, student_id, assignment_id, path):
+        timestamp = self._get_submission(
+            self.coursedir.course_id, assignment_id, student_id, path
+        )
+        return timestamp is not None
+
+    def _delete_leftovers(self):
+        """
+        Deletes the staged and replaced submissions that earlier collects
+        left next to the submissions of this one, in the background. Those
+        of collects that may still be running are kept.
+        """
+        dirs = set()
+        for rec in self.src_records:
+            dest_path = self.coursedir.format_path(
+                self.coursedir.submitted_directory,
+                rec['student_id'],
+                rec['assignment_id'],
+            )
+            dirs.add(os.path.dirname(dest_path))
+        leftovers = []
+        for path in sorted(dirs):
+            leftovers += glob.glob(os.path.join(path, '.*.staging-*'))
+            leftovers += glob.glob(os.path.join(path, '.*.old-*'))
+        leftovers = [x for x in leftovers if _is_abandoned(x)]
+        if leftovers:
+            self._cleanup_threads.append(
+                _delete_in_background(leftovers, 'ngshare-collect-cleanup')
+            )
+
+    def _update_submission(
+        self, student_id, assignment_id, dest_path, staging_path
+    ):
+        """
+        Stages the latest submission in ``staging_path``, comparing the
+        checksums of the files collected in ``dest_path`` with those on the
+        exchange. Unchanged files are linked from ``dest_path``, and the
+        submission is only downloaded if files changed, since ngshare does
+        not serve single files. Only the changed files and timestamp.txt are
+        written. Returns whether the submission could be staged, or None if
+        it has to be downloaded as a whole, since ngshare does not list
+        checksums or it was submitted again meanwhile.
+        """
+        manifest = self._get_submission_manifest(
+            self.coursedir.course_id, assignment_id, student_id
+        )
+        if manifest is None:
+            return False
+        if not all('checksum' in x for x in manifest['files']):
+            return None
+
+        local_files = set(_local_files(dest_path))
+        changed = set()
+        for entry in manifest['files']:
+            path = entry['path']
+            if path not in local_files or entry['checksum'] != file_checksum(
+                os.path.join(dest_path, path)
+            ):
+                changed.add(path)
+        removed = local_files - {x['path'] for x in manifest['files']}
+
+        if changed:
+            timestamp = self._get_submission(
+                self.coursedir.course_id,
+                assignment_id,
+                student_id,
+                staging_path,
+                include=lambda path: path in changed,
+            )
+            if timestamp is None:
+                return False
+            if timestamp != manifest['timestamp']:
+                # Submitted again meanwhile, so the whole submission changed.
+                shutil.rmtree(staging_path)
+                os.mkdir(staging_path)
+                return None
+        else:
+            with open(os.path.join(staging_path, 'timestamp.txt'), 'wb') as f:
+                f.write(manifest['timestamp'].encode())
+
+        # Collected files are never modified, so they can be shared with
+        # the replaced submission.
+        unchanged = local_files - removed - changed
+        for path in sorted(unchanged):
+            _link_or_copy(
+                os.path.join(dest_path, path), os.path.join(staging_path, path)
+            )
+        return True
@@ -7,6 +7,8 @@ import json
 import argparse
 from urllib.parse import quote
 
+from .atomic import atomic_write
+
 
 # https://www.geeksforgeeks.org/print-colors-python-terminal/
 def prRed(skk, exit=True):
@@ -39,25 +41,106 @@ def get_username():
         return os.environ['USER']
 
 
+# Environment variable overriding the ngshare URL from nbgrader_config.py.
+NGSHARE_URL_ENV = 'NGSHARE_URL'
+
+
+def url_cache_path():
+    from jupyter_core.paths import jupyter_data_dir
+
+    return os.path.join(jupyter_data_dir(), 'ngshare_url_cache.json')
+
+
+def config_files_key():
+    """
+    Returns a key identifying the nbgrader configuration NbGrader would load:
+    the paths of all its config files with their modification times (None
+    for missing files), and whether we are in a kubernetes environment.
+    """
+    from jupyter_core.paths import jupyter_config_dir, jupyter_config_path
+
+    config_dirs = [jupyter_config_dir()] + jupyter_config_path()
+    config_dirs.append(os.getcwd())
+    files = []
+    for config_dir in config_dirs:
+        for extension in ('.py', '.json'):
+            path = os.path.abspath(
+                os.path.join(config_dir, 'nbgrader_config' + extension)
+            )
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+            files.append([path, mtime])
+    return {
+        'files': files,
+        'k8s': 'PROXY_PUBLIC_SERVICE_HOST' in os.environ,
+    }
+
+
+def read_url_cache(key):
+    try:
+        with open(url_cache_path()) as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for entry in entries:
+        if entry.get('key') == key:
+            return entry.get('url')
+    return None
+
+
+def write_url_cache(key, url, max_entries=16):
+    path = url_cache_path()
+    try:
+        with open(path) as f:
+            entries = [x for x in json.load(f) if x.get('key') != key]
+    except (OSError, ValueError):
+        entries = []
+    entries.append({'key': key, 'url': url})
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_write(path) as f:
+            json.dump(entries[-max_entries:], f)
+    except OSError:
+        pass
+
+
 def ngshare_url():
+    """
+    Returns the ngshare URL. It is taken from the NGSHARE_URL environment
+    variable if set. Otherwise it is resolved from the nbgrader config, which
+    is only loaded if the config files changed since the URL was last cached.
+    """
     global _ngshare_url
     try:
         return _ngshare_url
     except NameError:
+        pass
+
+    if os.environ.get(NGSHARE_URL_ENV):
+        _ngshare_url = os.environ[NGSHARE_URL_ENV]
+        return _ngshare_url
+
+    key = config_files_key()
+    url = read_url_cache(key)
+    if url is None:
         try:
             from nbgrader.apps import NbGrader
 
             nbgrader = NbGrader()
             nbgrader.load_config_file()
             exchange = nbgrader.config.ExchangeFactory.exchange()
-            _ngshare_url = exchange.ngshare_url
-            return _ngshare_url
+            url = exchange.ngshare_url
         except Exception as e:
             prRed(
                 'Cannot determine ngshare URL. Please check your nbgrader_config.py!',
                 False,
             )
             prRed(e)
+        write_url_cache(key, url)
+    _ngshare_url = url
+    return _ngshare_url
 
 
 def get_header():
@@ -1,23 +1,149 @@
 #!/usr/bin/python
 import os
+import re
+import datetime
+import functools
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 import shutil
 import glob
-import requests
 import fnmatch
+import threading
+import time
 from pathlib import Path
 from urllib.parse import quote
-from rapidfuzz import fuzz
 
 from textwrap import dedent
 
-from traitlets import Unicode, Bool, default
-from jupyter_core.paths import jupyter_data_dir
+from traitlets import Unicode, Bool, Int, Instance, List, default, observe
+from traitlets.utils.importstring import import_item
 
 from nbgrader.exchange.abc import Exchange as ABCExchange
 from nbgrader.exchange import ExchangeError
 from nbgrader.utils import ignore_patterns
 import base64
 import json
+import sqlite3
+
+from .metrics import (
+    RequestMetrics,
+    endpoint_template,
+    format_prometheus,
+    write_textfile,
+)
+from .trace import NullTracer, Tracer, NULL_TRACER
+from .hooks import HookDispatcher
+from .list_cache import LIST_RESULTS
+from .atomic import atomic_write
+from .cache_index import CacheIndex
+
+# Bytes read at a time from streamed ngshare responses.
+STREAM_CHUNK_SIZE = 1 << 16
+
+# Traced methods that are reported to hooks as phases of an action.
+PHASES = {'init_src', 'init_dest', 'copy_files', 'list_files', 'remove_files'}
+
+
+# The requests sessions of the threads sending requests to ngshare.
+_sessions = threading.local()
+
+
+def _session():
+    """
+    Returns the requests session of the current thread, which keeps the
+    connections to ngshare open for later requests of the thread.
+    """
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        import requests
+
+        session = _sessions.session = requests.Session()
+    return session
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode())
+    return len(body)
+
+
+def _delete_dirs(paths):
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _delete_in_background(paths, name):
+    """
+    Deletes the directories at ``paths`` on a new thread named ``name``, which
+    is returned. It is not a daemon thread, so the deletion completes before
+    exit.
+    """
+    thread = threading.Thread(target=_delete_dirs, args=(paths,), name=name)
+    thread.start()
+    return thread
+
+
+class _ProfilingExecutor(ThreadPoolExecutor):
+    """
+    Thread pool that runs its tasks under one cProfile profiler per worker
+    thread, since a profiler only sees the thread that enabled it. The
+    profilers are appended to ``profilers`` to be merged into the profile of
+    the action.
+    """
+
+    def __init__(self, profilers, **kwargs):
+        super().__init__(**kwargs)
+        self.profilers = profilers
+        self._local = threading.local()
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(self._call_profiled, fn, args, kwargs)
+
+    def _call_profiled(self, fn, args, kwargs):
+        profiler = getattr(self._local, 'profiler', None)
+        if profiler is None:
+            import cProfile
+
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows a single profiler at a time, and the
+                # profiler of the action already sees all threads.
+                return fn(*args, **kwargs)
+            self._local.profiler = profiler
+            self.profilers.append(profiler)
+        else:
+            profiler.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+
+
+def traced(method):
+    """
+    Decorates an Exchange method so that its calls are recorded as trace
+    spans named after the method. Calls of the methods in PHASES are also
+    reported to the ``on_phase`` hooks.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.tracer.span(name):
+            return method(self, *args, **kwargs)
+
+    @functools.wraps(method)
+    def phase_wrapper(self, *args, **kwargs):
+        with self._phase(name):
+            return method(self, *args, **kwargs)
+
+    return phase_wrapper if name in PHASES else wrapper
 
 
 class Exchange(ABCExchange):
@@ -48,8 +174,62 @@ class Exchange(ABCExchange):
                 'ngshare url not configured in a non-k8s environment! Please configure the URL manually in nbgrader_config.py'
             )
 
+    max_concurrent_requests = Int(
+        8,
+        help=dedent(
+            '''
+            Maximum number of requests sent to ngshare concurrently by actions
+            that need many independent requests, e.g. listing the submissions
+            of a course. Set to 1 to send all requests one after another.
+            '''
+        ),
+    ).tag(config=True)
+
+    _executor = None
+    # Profilers of the executor threads while the action is profiled.
+    _worker_profilers = None
+
+    @property
+    def executor(self):
+        '''
+        The thread pool running the concurrent requests of the current action,
+        with ``max_concurrent_requests`` threads. It is shut down when the
+        action completes. Tasks must not wait for other tasks of the pool.
+        '''
+        if self._executor is None:
+            kwargs = dict(
+                max_workers=max(1, self.max_concurrent_requests),
+                thread_name_prefix='ngshare',
+            )
+            if self._worker_profilers is not None:
+                self._executor = _ProfilingExecutor(
+                    self._worker_profilers, **kwargs
+                )
+            else:
+                self._executor = ThreadPoolExecutor(**kwargs)
+        return self._executor
+
+    def _shutdown_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def map_concurrent(self, func, items):
+        '''
+        Returns the list of ``func(item)`` for all ``items``, calling ``func``
+        concurrently in the ``executor``. The results are in the order of
+        ``items``; if calls raise, the exception of the first of them is
+        raised after all calls completed.
+        '''
+        items = list(items)
+        if self.max_concurrent_requests <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        futures = [self.executor.submit(func, item) for item in items]
+        wait(futures)
+        return [future.result() for future in futures]
+
     def _ngshare_api_check_error(self, response, url):
-        if response.status_code != requests.codes.ok:
+        if response.status_code != 200:
             self.log.error(
                 'ngshare service returned invalid status code %d.',
                 response.status_code,
@@ -79,30 +259,306 @@ class Exchange(ABCExchange):
             return None
         return response
 
+    metrics = Instance(
+        RequestMetrics,
+        help='Metrics of the ngshare requests made during the last action.',
+    )
+
+    @default('metrics')
+    def _metrics_default(self):
+        return RequestMetrics()
+
+    log_request_metrics = Bool(
+        False,
+        help=dedent(
+            '''
+            Log a summary of the ngshare requests of every action at the info
+            level. The summary is otherwise logged at the debug level.
+            '''
+        ),
+    ).tag(config=True)
+
+    trace_output = Unicode(
+        '',
+        help=dedent(
+            '''
+            Directory to write a trace of every exchange action to, in the
+            Chrome trace event format (see chrome://tracing or
+            https://ui.perfetto.dev). Tracing is disabled if empty.
+            '''
+        ),
+    ).tag(config=True)
+
+    tracer = Instance(NullTracer)
+
+    @default('tracer')
+    def _tracer_default(self):
+        return NULL_TRACER
+
+    event_hooks = List(
+        help=dedent(
+            '''
+            Hooks receiving events of every exchange action: ngshare requests,
+            encoded and decoded files, and the phases of the action. Each
+            entry is an object, a class or the import string of either, see
+            ngshare_exchange.hooks.ExchangeHook for the events. Classes are
+            instantiated without arguments.
+            '''
+        ),
+    ).tag(config=True)
+
+    hooks = Instance(HookDispatcher)
+
+    # Hooks added with register_hook, kept when event_hooks changes.
+    _registered_hooks = List()
+
+    @default('hooks')
+    def _hooks_default(self):
+        hooks = []
+        for hook in self.event_hooks:
+            if isinstance(hook, str):
+                hook = import_item(hook)
+            if isinstance(hook, type):
+                hook = hook()
+            hooks.append(hook)
+        return HookDispatcher(hooks + self._registered_hooks, self.log)
+
+    @observe('event_hooks')
+    def _event_hooks_changed(self, change):
+        self.hooks.flush()
+        self.hooks = self._hooks_default()
+
+    def register_hook(self, hook):
+        '''Registers an object receiving the events of this exchange.'''
+        # The dispatcher is created first, so that it does not get the hook
+        # twice.
+        hooks = self.hooks
+        self._registered_hooks.append(hook)
+        hooks.add(hook)
+
+    @contextmanager
+    def _phase(self, name, **args):
+        self.hooks.emit('on_phase', phase=name, event='start', duration=None)
+        start_time = time.perf_counter()
+        try:
+            with self.tracer.span(name, **args):
+                yield
+        finally:
+            self.hooks.emit(
+                'on_phase',
+                phase=name,
+                event='end',
+                duration=time.perf_counter() - start_time,
+            )
+
+    prometheus_textfile_dir = Unicode(
+        '',
+        help=dedent(
+            '''
+            Directory read by the textfile collector of the Prometheus node
+            exporter. If set, the duration, submission counts, transferred
+            bytes and HTTP errors of every exchange action are written to a
+            .prom file there, one file per action, course and assignment.
+            '''
+        ),
+    ).tag(config=True)
+
+    profile_output = Unicode(
+        '',
+        help=dedent(
+            '''
+            Directory to write cProfile statistics of every exchange action
+            to, one .pstats file per action that can be inspected with the
+            pstats module or tools like snakeviz. The statistics include the
+            requests sent concurrently by the ``executor`` threads, merged
+            with those of the thread running the action. Profiling is
+            disabled if empty.
+            '''
+        ),
+    ).tag(config=True)
+
+    tracemalloc_output = Unicode(
+        '',
+        help=dedent(
+            '''
+            Directory to write the top memory allocations of every exchange
+            action to, as traced by tracemalloc. Memory tracing is disabled if
+            empty.
+            '''
+        ),
+    ).tag(config=True)
+
+    tracemalloc_top = Int(
+        25,
+        help='Number of allocation sites written to the tracemalloc report.',
+    ).tag(config=True)
+
+    submission_counts = Instance(
+        Counter,
+        args=(),
+        help='Submissions processed during the last action, by result.',
+    )
+
+    # Whether the action changes the results of nbgrader list, so that the
+    # results cached by ExchangeList.result_cache must be invalidated.
+    changes_list_results = False
+
+    @property
+    def action_name(self):
+        '''The name of the action, e.g. "release_feedback".'''
+        name = type(self).__name__
+        if name.startswith('Exchange') and name != 'Exchange':
+            name = name[len('Exchange') :]
+        return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+
+    def _output_path(self, directory, extension):
+        '''
+        Returns a path in ``directory`` for a file describing this action,
+        named by the action, course, assignment and the current time.
+        '''
+        parts = [
+            self.action_name,
+            self.coursedir.course_id or '*',
+            self.coursedir.assignment_id or '*',
+            datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f'),
+        ]
+        name = re.sub(r'[^\w.-]', '_', '-'.join(parts))
+        return os.path.join(directory, name + extension)
+
     def ngshare_api_request(self, method, url, data=None, params=None):
-        encoded_url = self.encode_url(url)
+        template = endpoint_template(url)
+        with self.tracer.span(method + ' ' + template, url=url):
+            return self._ngshare_api_request(
+                method, url, template, data, params
+            )
+
+    def _send_request(self, method, url, data=None, params=None, stream=False):
+        headers = None
+        if 'JUPYTERHUB_API_TOKEN' in os.environ:
+            headers = {
+                'Authorization': 'token ' + os.environ['JUPYTERHUB_API_TOKEN']
+            }
+        session = _session()
         try:
-            headers = None
-            if 'JUPYTERHUB_API_TOKEN' in os.environ:
-                headers = {
-                    'Authorization': 'token '
-                    + os.environ['JUPYTERHUB_API_TOKEN']
-                }
-            response = requests.request(
+            return session.request(
                 method,
-                self.ngshare_url + encoded_url,
+                self.ngshare_url + self.encode_url(url),
                 headers=headers,
                 data=data,
                 params=params,
+                stream=stream,
             )
+        finally:
+            # Like separate requests, requests do not share cookies.
+            session.cookies.clear()
+
+    def _ngshare_api_request(self, method, url, template, data, params):
+        self.hooks.emit(
+            'on_request_start', method=method, url=url, template=template
+        )
+        start_time = time.perf_counter()
+        try:
+            response = self._send_request(method, url, data, params)
         except Exception:
+            self._record_request(method, url, template, None, start_time, 0, 0)
             self.log.exception(
                 'An error occurred when querying the ngshare ' 'endpoint %s',
                 url,
             )
             return None
+        self._record_request(
+            method,
+            url,
+            template,
+            response.status_code,
+            start_time,
+            _body_size(response.request.body),
+            len(response.content),
+        )
         return self._ngshare_api_check_error(response, url)
 
+    @contextmanager
+    def ngshare_api_stream(self, url, params=None):
+        """
+        Sends a GET request to ngshare and yields an iterator over the chunks
+        of the response body, which is read while it is iterated, so that
+        large responses are never held in memory. Yields None if the request
+        failed, after logging the error. Whether the response reports
+        success has to be checked by the caller.
+        """
+        template = endpoint_template(url)
+        with self.tracer.span('GET ' + template, url=url):
+            self.hooks.emit(
+                'on_request_start', method='GET', url=url, template=template
+            )
+            start_time = time.perf_counter()
+            try:
+                response = self._send_request(
+                    'GET', url, params=params, stream=True
+                )
+            except Exception:
+                response = None
+                self.log.exception(
+                    'An error occurred when querying the ngshare endpoint %s',
+                    url,
+                )
+            if response is None:
+                self._record_request(
+                    'GET', url, template, None, start_time, 0, 0
+                )
+                yield None
+                return
+
+            status = response.status_code
+            received = 0
+
+            def iter_chunks():
+                nonlocal received
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    received += len(chunk)
+                    yield chunk
+
+            try:
+                if status != 200:
+                    received = len(response.content)
+                    self._ngshare_api_check_error(response, url)
+                    yield None
+                else:
+                    yield iter_chunks()
+            except BaseException:
+                status = None
+                raise
+            finally:
+                response.close()
+                self._record_request(
+                    'GET', url, template, status, start_time, 0, received
+                )
+
+    def _record_request(
+        self,
+        method,
+        url,
+        template,
+        status,
+        start_time,
+        bytes_sent,
+        bytes_received,
+    ):
+        duration = time.perf_counter() - start_time
+        self.metrics.record_request(
+            method, template, status, duration, bytes_sent, bytes_received
+        )
+        self.hooks.emit(
+            'on_request_end',
+            method=method,
+            url=url,
+            template=template,
+            status=status,
+            duration=duration,
+            bytes_sent=bytes_sent,
+            bytes_received=bytes_received,
+        )
+
     def encode_url(self, url):
         return quote(url, safe='/', encoding=None, errors=None)
 
@@ -132,8 +588,37 @@ class Exchange(ABCExchange):
 
     @default('cache')
     def _cache_default(self):
+        from jupyter_core.paths import jupyter_data_dir
+
         return os.path.join(jupyter_data_dir(), 'nbgrader_cache')
 
+    def _cached_submissions(self, course_id, student_id, assignment_id):
+        """
+        Returns the submissions in the local cache as a sorted list of pairs
+        of the path of the submission and the sorted paths of its notebooks.
+        Each of the IDs may be '*' to match all.
+        """
+        # The index is not created for a cache that does not exist yet.
+        if os.path.isdir(self.cache):
+            try:
+                return CacheIndex(self.cache).submissions(
+                    course_id, student_id, assignment_id
+                )
+            except (sqlite3.Error, OSError):
+                self.log.warning(
+                    'Failed to read the index of the submission cache.',
+                    exc_info=True,
+                )
+        pattern = os.path.join(
+            self.cache,
+            course_id,
+            '{}+{}+*'.format(student_id, assignment_id),
+        )
+        return [
+            (path, sorted(glob.glob(os.path.join(path, '*.ipynb'))))
+            for path in sorted(glob.glob(pattern))
+        ]
+
     path_includes_course = Bool(
         False,
         help=dedent(
@@ -146,6 +631,7 @@ class Exchange(ABCExchange):
         ),
     ).tag(config=True)
 
+    @traced
     def decode_dir(self, src_dir, dest_dir, ignore=None, noclobber=False):
         """
         decode an encoded directory tree and saw the decoded files to des
@@ -184,7 +670,9 @@ class Exchange(ABCExchange):
 
             with open(dest_path, 'wb') as d:
                 d.write(decoded_content)
+            self.hooks.emit('on_file_decoded', path=dest_path, size=file_size)
 
+    @traced
     def encode_dir(self, src_dir, ignore=None):
         encoded_files = []
         for subdir, dirs, files in os.walk(src_dir):
@@ -206,6 +694,13 @@ class Exchange(ABCExchange):
 
                 self.log.info('Encoding: {}'.format(file_path))
                 encoded = base64.b64encode(data_bytes)
+                self.metrics.record_encoded(len(data_bytes), len(encoded))
+                self.hooks.emit(
+                    'on_file_encoded',
+                    path=file_path,
+                    size=len(data_bytes),
+                    encoded_size=len(encoded),
+                )
                 content = str(encoded, 'utf-8')
                 file_map = {'path': file_path, 'content': content}
                 encoded_files.append(file_map)
@@ -229,9 +724,220 @@ class Exchange(ABCExchange):
         raise NotImplementedError
 
     def start(self):
-        return super(Exchange, self).start()
+        self.metrics = RequestMetrics()
+        self.tracer = Tracer() if self.trace_output else NULL_TRACER
+        self.submission_counts = Counter()
+        start_time = time.perf_counter()
+        success = False
+        try:
+            with self._phase(
+                self.action_name,
+                course=self.coursedir.course_id,
+                assignment=self.coursedir.assignment_id,
+            ), self._profiled():
+                result = super(Exchange, self).start()
+            success = True
+            return result
+        finally:
+            self._shutdown_executor()
+            if self.changes_list_results:
+                self._invalidate_list_results()
+            self.hooks.flush()
+            self.log.log(
+                logging.INFO if self.log_request_metrics else logging.DEBUG,
+                'ngshare request metrics:\n%s',
+                self.metrics.format_summary(),
+            )
+            if self.tracer.enabled:
+                self._write_trace()
+            if self.prometheus_textfile_dir:
+                self._write_prometheus_textfile(
+                    time.perf_counter() - start_time, success
+                )
+
+    @contextmanager
+    def _profiled(self):
+        '''
+        Runs the body under cProfile and tracemalloc as configured by
+        ``profile_output`` and ``tracemalloc_output``, and writes the results
+        when it completes. The tasks of the ``executor`` are profiled in their
+        threads and merged into the profile.
+        '''
+        profiler = None
+        started_tracemalloc = False
+        if self.profile_output:
+            import cProfile
+
+            profiler = cProfile.Profile()
+            self._worker_profilers = []
+        if self.tracemalloc_output:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracemalloc = True
+            elif hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                # Wait for the tasks still running so that they are profiled.
+                self._shutdown_executor()
+                self._write_profile(profiler, self._worker_profilers)
+                self._worker_profilers = None
+            if self.tracemalloc_output:
+                self._write_tracemalloc()
+                if started_tracemalloc:
+                    tracemalloc.stop()
+
+    def _write_profile(self, profiler, worker_profilers):
+        import pstats
+
+        try:
+            stats = pstats.Stats(profiler)
+            for worker_profiler in worker_profilers:
+                stats.add(worker_profiler)
+            os.makedirs(self.profile_output, exist_ok=True)
+            path = self._output_path(self.profile_output, '.pstats')
+            stats.dump_stats(path)
+        except Exception:
+            self.log.warning('Failed to write profile.', exc_info=True)
+        else:
+            self.log.debug('Wrote profile to {}'.format(path))
+
+    def _write_tracemalloc(self):
+        import tracemalloc
+
+        try:
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                ]
+            )
+            current, peak = tracemalloc.get_traced_memory()
+            stats = snapshot.statistics('lineno')
+            os.makedirs(self.tracemalloc_output, exist_ok=True)
+            path = self._output_path(self.tracemalloc_output, '.txt')
+            with open(path, 'w') as f:
+                f.write(
+                    'current: {} bytes, peak: {} bytes, {} blocks in {} '
+                    'allocation sites\n'.format(
+                        current,
+                        peak,
+                        sum(x.count for x in stats),
+                        len(stats),
+                    )
+                )
+                for stat in stats[: self.tracemalloc_top]:
+                    f.write('{}\n'.format(stat))
+        except Exception:
+            self.log.warning('Failed to write memory trace.', exc_info=True)
+        else:
+            self.log.debug('Wrote memory trace to {}'.format(path))
+
+    def _invalidate_list_results(self):
+        try:
+            LIST_RESULTS.invalidate(self.cache)
+        except OSError:
+            self.log.warning(
+                'Failed to invalidate cached list results.', exc_info=True
+            )
+
+    def _feedback_memo_path(self):
+        return os.path.join(self.cache, '.feedback_memo.json')
+
+    def _load_feedback_memo(self):
+        '''
+        Returns the feedback checksums memoized by nbgrader list --cached, by
+        the path of the cached submission.
+        '''
+        try:
+            with open(self._feedback_memo_path()) as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(memo, dict):
+            return {}
+        return {
+            path: entry
+            for path, entry in memo.items()
+            if isinstance(entry, dict) and 'local_checksums' in entry
+        }
+
+    def _forget_feedback_memo(self, course_id, assignment_id, student_id):
+        '''
+        Drops the memoized feedback checksums of the matching submissions,
+        since their feedback changes. The IDs may be glob patterns.
+        '''
+        memo = self._load_feedback_memo()
+        kept = {}
+        for path, entry in memo.items():
+            head, name = os.path.split(path)
+            parts = name.split('+')
+            if (
+                len(parts) == 3
+                and os.path.basename(head) == course_id
+                and fnmatch.fnmatchcase(parts[0], student_id)
+                and fnmatch.fnmatchcase(parts[1], assignment_id)
+            ):
+                continue
+            kept[path] = entry
+        if len(kept) == len(memo):
+            return
+        try:
+            with atomic_write(self._feedback_memo_path()) as f:
+                json.dump(kept, f)
+        except OSError:
+            self.log.warning(
+                'Failed to update memoized feedback checksums.', exc_info=True
+            )
+
+    def _write_prometheus_textfile(self, duration, success):
+        labels = {
+            'action': self.action_name,
+            'course': self.coursedir.course_id,
+            'assignment': self.coursedir.assignment_id,
+        }
+        name = re.sub(
+            r'[^\w.-]',
+            '_',
+            'ngshare_exchange_{action}_{course}_{assignment}'.format(**labels),
+        )
+        path = os.path.join(self.prometheus_textfile_dir, name + '.prom')
+        try:
+            write_textfile(
+                path,
+                format_prometheus(
+                    labels,
+                    duration,
+                    success,
+                    self.submission_counts,
+                    self.metrics.summary(),
+                ),
+            )
+        except Exception:
+            self.log.warning(
+                'Failed to write Prometheus metrics.', exc_info=True
+            )
+
+    def _write_trace(self):
+        try:
+            os.makedirs(self.trace_output, exist_ok=True)
+            path = self._output_path(self.trace_output, '.json')
+            self.tracer.write(path)
+        except Exception:
+            self.log.warning('Failed to write trace.', exc_info=True)
+        else:
+            self.log.debug('Wrote trace to {}'.format(path))
 
     def _assignment_not_found(self, src_path, other_path):
+        from rapidfuzz import fuzz
+
         msg = "Assignment not found at: {}".format(src_path)
         self.log.fatal(msg)
         found = glob.glob(other_path)
@@ -241,6 +947,7 @@ class Exchange(ABCExchange):
 
         raise ExchangeError(msg)
 
+    @traced
     def do_copy(self, src, dest, log=None):
         """
         Copy the src dir to the dest dir, omitting excluded
@@ -4,10 +4,12 @@ import os
 from nbgrader.exchange.abc import (
     ExchangeFetchAssignment as ABCExchangeFetchAssignment,
 )
-from .exchange import Exchange
+from .exchange import Exchange, traced
 
 
 class ExchangeFetchAssignment(Exchange, ABCExchangeFetchAssignment):
+    changes_list_results = True
+
     def _load_config(self, cfg, **kwargs):
         if 'ExchangeFetch' in cfg:
             self.log.warning(
@@ -25,6 +27,7 @@ class ExchangeFetchAssignment(Exchange, ABCExchangeFetchAssignment):
 
         super(ExchangeFetchAssignment, self)._load_config(cfg, **kwargs)
 
+    @traced
     def init_src(self):
         if self.coursedir.course_id == '':
             self.fail('No course id specified. Re-run with --course flag.')
@@ -37,6 +40,7 @@ class ExchangeFetchAssignment(Exchange, ABCExchangeFetchAssignment):
             self.coursedir.course_id, self.coursedir.assignment_id
         )
 
+    @traced
     def init_dest(self):
         if self.path_includes_course:
             root = os.path.join(
@@ -54,6 +58,7 @@ class ExchangeFetchAssignment(Exchange, ABCExchangeFetchAssignment):
                 )
             )
 
+    @traced
     def do_copy(self, files):
         '''Copy the src dir to the dest dir omitting the self.coursedir.ignore globs.'''
         if os.path.isdir(self.dest_path):
@@ -70,6 +75,7 @@ class ExchangeFetchAssignment(Exchange, ABCExchangeFetchAssignment):
             'Successfully decoded {}.'.format(self.coursedir.assignment_id)
         )
 
+    @traced
     def copy_files(self):
         response = self.ngshare_api_get(self.src_path)
         if response is None:
@@ -1,15 +1,17 @@
 #!/usr/bin/python
 import os
-import glob
 from pathlib import Path
 
 from nbgrader.exchange.abc import (
     ExchangeFetchFeedback as ABCExchangeFetchFeedback,
 )
-from .exchange import Exchange
+from .exchange import Exchange, traced
 
 
 class ExchangeFetchFeedback(Exchange, ABCExchangeFetchFeedback):
+    changes_list_results = True
+
+    @traced
     def init_src(self):
         if self.coursedir.course_id == '':
             self.fail('No course id specified. Re-run with --course flag.')
@@ -20,9 +22,10 @@ class ExchangeFetchFeedback(Exchange, ABCExchangeFetchFeedback):
             if self.coursedir.assignment_id
             else '*'
         )
-        pattern = os.path.join(self.cache_path, '*+{}+*'.format(assignment_id))
         self.log.debug(
-            'Looking for submissions with pattern: {}'.format(pattern)
+            'Looking for submissions of {} in {}'.format(
+                assignment_id, self.cache_path
+            )
         )
 
         self.src_path = '/feedback/{}/{}/{}'.format(
@@ -30,11 +33,17 @@ class ExchangeFetchFeedback(Exchange, ABCExchangeFetchFeedback):
         )
 
         self.timestamps = []
-        submissions = [os.path.split(x)[-1] for x in glob.glob(pattern)]
+        submissions = [
+            os.path.split(path)[-1]
+            for path, _ in self._cached_submissions(
+                self.coursedir.course_id, '*', assignment_id
+            )
+        ]
         for submission in submissions:
             (_, assignment_id, timestamp) = submission.split('/')[-1].split('+')
             self.timestamps.append(timestamp)
 
+    @traced
     def init_dest(self):
         if self.path_includes_course:
             root = os.path.join(
@@ -46,8 +55,14 @@ class ExchangeFetchFeedback(Exchange, ABCExchangeFetchFeedback):
             os.path.join(self.assignment_dir, root, 'feedback')
         )
 
+    @traced
     def copy_files(self):
         self.log.info('Fetching feedback from server')
+        self._forget_feedback_memo(
+            self.coursedir.course_id,
+            self.coursedir.assignment_id or '*',
+            self.username,
+        )
         available = False
 
         for timestamp in self.timestamps:
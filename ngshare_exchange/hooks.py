@@ -0,0 +1,109 @@
+import queue
+import threading
+
+
+class ExchangeHook:
+    """
+    Base class for objects receiving events from exchange actions. Register
+    hooks with ``Exchange.event_hooks`` in nbgrader_config.py or with
+    ``Exchange.register_hook``, and override the events of interest.
+
+    Events are delivered in order on a background thread, so hooks do not
+    slow down the action. Exceptions raised by hooks are logged and ignored.
+    """
+
+    def on_request_start(self, method, url, template):
+        """
+        Called before a request to ngshare. ``url`` is the unencoded request
+        path and ``template`` its endpoint template, e.g.
+        ``/submission/{course}/{assignment}/{student}``.
+        """
+
+    def on_request_end(
+        self,
+        method,
+        url,
+        template,
+        status,
+        duration,
+        bytes_sent,
+        bytes_received,
+    ):
+        """
+        Called after a request to ngshare. ``status`` is the HTTP status code
+        or None if no response was received, ``duration`` is in seconds.
+        """
+
+    def on_file_encoded(self, path, size, encoded_size):
+        """
+        Called after a file has been base64-encoded for upload. ``size`` is
+        the size of the file and ``encoded_size`` the size of its encoding.
+        """
+
+    def on_file_decoded(self, path, size):
+        """
+        Called after a downloaded file has been decoded to ``path``.
+        """
+
+    def on_phase(self, phase, event, duration):
+        """
+        Called when the action or one of its phases (``init_src``,
+        ``init_dest``, ``copy_files``, ...) starts and ends. ``event`` is
+        either 'start' or 'end'; ``duration`` is in seconds, or None at the
+        start of the phase.
+        """
+
+
+class HookDispatcher:
+    """
+    Delivers events to hooks from a background thread.
+    """
+
+    def __init__(self, hooks, log):
+        self.hooks = list(hooks)
+        self.log = log
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, hook):
+        self.hooks.append(hook)
+
+    def emit(self, callback_name, **kwargs):
+        if not self.hooks:
+            return
+        self._queue.put((callback_name, kwargs))
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name='ngshare-hooks', daemon=True
+                    )
+                    self._thread.start()
+
+    def flush(self):
+        """
+        Waits until all events emitted so far have been delivered.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+            if thread is None:
+                return
+            self._queue.put(None)
+        thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            callback_name, kwargs = item
+            for hook in self.hooks:
+                callback = getattr(hook, callback_name, None)
+                if callback is None:
+                    continue
+                try:
+                    callback(**kwargs)
+                except Exception:
+                    self.log.exception('Exchange hook %r failed.', hook)
@@ -0,0 +1,325 @@
+import base64
+import itertools
+import json
+import os
+import re
+
+_WHITESPACE = b' \t\r\n'
+_ESCAPES = {
+    b'"': b'"',
+    b'\\': b'\\',
+    b'/': b'/',
+    b'b': b'\b',
+    b'f': b'\f',
+    b'n': b'\n',
+    b'r': b'\r',
+    b't': b'\t',
+}
+_DELIMITERS = b',}]' + _WHITESPACE
+_ESCAPE = re.compile(rb'\\(.)', re.DOTALL)
+
+# Bytes of base64 content collected before they are decoded and written.
+DECODE_BUFFER_SIZE = 1 << 16
+
+
+def _replace_escapes(piece, escapes):
+    """
+    Returns ``piece`` with its escapes replaced, which must all be escapes of
+    the single characters ``escapes`` other than the backslash.
+    """
+    for escape in escapes:
+        if escape not in _ESCAPES:
+            raise ValueError(
+                'Invalid escape {!r} in JSON string.'.format(escape)
+            )
+        piece = piece.replace(b'\\' + escape, _ESCAPES[escape])
+    return piece
+
+
+class _Reader:
+    """
+    Reads JSON tokens from an iterator over chunks of bytes. Strings can be
+    read piece by piece, so that values larger than memory can be streamed.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+        self._pos = 0
+
+    def _fill(self):
+        while self._pos >= len(self._buffer):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                raise ValueError('Unexpected end of JSON.')
+            self._buffer = chunk
+            self._pos = 0
+
+    def read(self, n=1):
+        data = b''
+        while len(data) < n:
+            self._fill()
+            end = self._pos + n - len(data)
+            data += self._buffer[self._pos : end]
+            self._pos = min(end, len(self._buffer))
+        return data
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next byte without consuming it.
+        """
+        while True:
+            self._fill()
+            c = self._buffer[self._pos : self._pos + 1]
+            if c not in _WHITESPACE:
+                return c
+            self._pos += 1
+
+    def next(self):
+        c = self.peek()
+        self._pos += 1
+        return c
+
+    def expect(self, token):
+        c = self.next()
+        if c != token:
+            raise ValueError(
+                'Expected {!r} in JSON, got {!r}.'.format(token, c)
+            )
+
+    def _string_end(self):
+        """
+        Returns the position of the quote ending the current string in the
+        buffer, or -1 if the string continues in the next chunk.
+        """
+        buffer = self._buffer
+        quote = buffer.find(b'"', self._pos)
+        while quote != -1:
+            start = quote
+            while start > self._pos and buffer[start - 1] == ord('\\'):
+                start -= 1
+            if (quote - start) % 2 == 0:
+                return quote
+            quote = buffer.find(b'"', quote + 1)
+        return -1
+
+    def iter_string(self):
+        """
+        Yields the bytes of a string as UTF-8 in pieces, with escapes
+        replaced. The opening quote must have been read.
+        """
+        while True:
+            self._fill()
+            buffer = self._buffer
+            end = self._string_end()
+            stop = len(buffer) if end == -1 else end
+            if end == -1 and buffer.endswith(b'\\'):
+                # The escape continues in the next chunk.
+                stop -= 1
+            piece = buffer[self._pos : stop]
+            escapes = set(_ESCAPE.findall(piece))
+            if (
+                piece
+                and not piece.endswith(b'\\')
+                and b'u' not in escapes
+                and b'\\' not in escapes
+            ):
+                # Only escapes of single characters, e.g. the line breaks in
+                # base64 content, which are replaced in the whole piece.
+                yield _replace_escapes(piece, escapes)
+                self._pos = stop
+                if end != -1:
+                    self._pos = end + 1
+                    return
+                continue
+
+            quote = buffer.find(b'"', self._pos)
+            backslash = buffer.find(b'\\', self._pos)
+            while True:
+                # Escapes are frequent in some strings, so the positions of
+                # the next quote and backslash are only searched again once
+                # they have been passed.
+                if quote != -1 and quote < self._pos:
+                    quote = buffer.find(b'"', self._pos)
+                if backslash != -1 and backslash < self._pos:
+                    backslash = buffer.find(b'\\', self._pos)
+                end = min(x for x in (quote, backslash, len(buffer)) if x >= 0)
+                if end > self._pos:
+                    yield buffer[self._pos : end]
+                if end == len(buffer):
+                    self._pos = end
+                    break
+                self._pos = end + 1
+                if end == quote:
+                    return
+                yield self._read_escape()
+                if self._buffer is not buffer:
+                    # The escape continued in the next chunk.
+                    break
+
+    def _read_escape(self):
+        c = self.read(1)
+        if c in _ESCAPES:
+            return _ESCAPES[c]
+        if c != b'u':
+            raise ValueError('Invalid escape {!r} in JSON string.'.format(c))
+        code = int(self.read(4), 16)
+        if 0xD800 <= code < 0xDC00:
+            if self.read(2) != b'\\u':
+                raise ValueError('Unpaired surrogate in JSON string.')
+            low = int(self.read(4), 16)
+            code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+        return chr(code).encode('utf-8')
+
+    def string(self):
+        self.expect(b'"')
+        return b''.join(self.iter_string()).decode('utf-8')
+
+    def members(self):
+        """
+        Yields the keys of an object, after which their values must be read.
+        The opening brace must have been read.
+        """
+        if self.peek() == b'}':
+            self.next()
+            return
+        while True:
+            key = self.string()
+            self.expect(b':')
+            yield key
+            c = self.next()
+            if c == b'}':
+                return
+            if c != b',':
+                raise ValueError(
+                    'Expected "," or "}}" in JSON, got {!r}.'.format(c)
+                )
+
+    def items(self):
+        """
+        Yields once for every item of an array, which must be read before the
+        next one. The opening bracket must have been read.
+        """
+        if self.peek() == b']':
+            self.next()
+            return
+        while True:
+            yield
+            c = self.next()
+            if c == b']':
+                return
+            if c != b',':
+                raise ValueError(
+                    'Expected "," or "]" in JSON, got {!r}.'.format(c)
+                )
+
+    def value(self):
+        """
+        Reads a value and returns it as decoded by ``json``.
+        """
+        c = self.peek()
+        if c == b'{':
+            self.next()
+            return {key: self.value() for key in self.members()}
+        if c == b'[':
+            self.next()
+            return [self.value() for _ in self.items()]
+        if c == b'"':
+            return self.string()
+        token = b''
+        while True:
+            self._fill()
+            c = self._buffer[self._pos : self._pos + 1]
+            if c in _DELIMITERS:
+                return json.loads(token)
+            token += c
+            self._pos += 1
+
+
+def _decode_base64(pieces, path):
+    """
+    Writes the base64 encoded ``pieces`` decoded to ``path``. Returns the
+    size of the decoded file.
+    """
+    size = 0
+    buffer = []
+    buffered = 0
+    rest = b''
+    with open(path, 'wb') as f:
+        # Pieces can be short, e.g. between escapes that are not replaced
+        # in bulk, so they are decoded together.
+        for piece in itertools.chain(pieces, [None]):
+            if piece is not None:
+                buffer.append(piece)
+                buffered += len(piece)
+                if buffered < DECODE_BUFFER_SIZE:
+                    continue
+            data = rest + b''.join(buffer).translate(None, _WHITESPACE)
+            end = len(data) // 4 * 4
+            decoded = base64.b64decode(data[:end])
+            f.write(decoded)
+            size += len(decoded)
+            rest = data[end:]
+            buffer = []
+            buffered = 0
+        if rest:
+            raise ValueError('Invalid length of base64 content.')
+    return size
+
+
+def _decode_file(reader, dest_dir, part_path, include, on_file):
+    entry = {}
+    size = None
+    reader.expect(b'{')
+    for key in reader.members():
+        if key == 'content':
+            reader.expect(b'"')
+            size = _decode_base64(reader.iter_string(), part_path)
+        else:
+            entry[key] = reader.value()
+    if 'path' not in entry or size is None:
+        raise ValueError('File without path or content in JSON.')
+
+    if include is None or include(entry['path']):
+        dest_path = os.path.join(dest_dir, entry['path'])
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        os.replace(part_path, dest_path)
+        if on_file is not None:
+            on_file(dest_path, size)
+    else:
+        os.remove(part_path)
+    entry['size'] = size
+    return entry
+
+
+def decode_files(chunks, dest_dir, include=None, on_file=None):
+    """
+    Parses a JSON object from ``chunks`` of bytes, writing the files in its
+    'files' array to ``dest_dir`` while they are read. Every file is an
+    object with a 'path' relative to ``dest_dir`` and the base64 encoded
+    'content', which is never held in memory as a whole.
+
+    ``include`` - If given, only files for whose path it returns True are
+    written.
+    ``on_file`` - If given, called with the path and size of every written
+    file.
+
+    Returns the object, with the content of every file replaced by its
+    decoded 'size'.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    # Written to a hidden file first, since the path may follow the content.
+    part_path = os.path.join(dest_dir, '.ngshare-part')
+    reader = _Reader(chunks)
+    reader.expect(b'{')
+    result = {}
+    for key in reader.members():
+        if key == 'files':
+            reader.expect(b'[')
+            result['files'] = [
+                _decode_file(reader, dest_dir, part_path, include, on_file)
+                for _ in reader.items()
+            ]
+        else:
+            result[key] = reader.value()
+    return result
@@ -1,34 +1,70 @@
+import copy
 import os
 import glob
-import shutil
+import itertools
+import json
 import re
-import hashlib
+import sys
+import time
+from urllib.parse import quote
 
 from nbgrader.exchange.abc import ExchangeList as ABCExchangeList
-from .exchange import Exchange
+from textwrap import dedent
+from traitlets import Bool, Dict, Enum, Float
+from .atomic import atomic_write
+from .checksums import ChecksumCache
+from .exchange import Exchange, _delete_in_background, traced
+from .list_cache import LIST_RESULTS
 
 
-def _checksum(path):
-    m = hashlib.md5()
-    m.update(open(path, 'rb').read())
-    return m.hexdigest()
+class _Notebook:
+    """
+    A notebook of an inbound submission and the checksum of its feedback, or
+    None if there is no feedback.
+    """
+
+    __slots__ = ('notebook_id', 'feedback_checksum')
+
+    def __init__(self, notebook_id, feedback_checksum):
+        self.notebook_id = sys.intern(notebook_id)
+        self.feedback_checksum = feedback_checksum
+
+
+class _Submission:
+    """
+    An inbound submission as listed by ngshare. The IDs are interned, since
+    they repeat across the submissions of large courses. ``notebooks`` is a
+    tuple of _Notebook, or None if the notebooks are not listed.
+    """
+
+    __slots__ = (
+        'course_id',
+        'assignment_id',
+        'student_id',
+        'timestamp',
+        'notebooks',
+    )
+
+    def __init__(
+        self, course_id, assignment_id, student_id, timestamp, notebooks=None
+    ):
+        self.course_id = sys.intern(course_id)
+        self.assignment_id = sys.intern(assignment_id)
+        self.student_id = sys.intern(student_id)
+        self.timestamp = timestamp
+        self.notebooks = notebooks
 
 
 def _merge_notebooks_feedback(notebook_ids, checksums):
     """
-    Returns a list of dictionaries with 'notebook_id' and 'feedback_checksum'.
+    Returns a tuple of _Notebook.
 
     ``notebook_ids`` - A list of notebook IDs.
     ``checksum`` - A dictionary mapping notebook IDs to checksums.
     """
-    merged = []
-    for nb_id in notebook_ids:
-        if nb_id not in checksums.keys():
-            checksum = None
-        else:
-            checksum = checksums[nb_id]
-        merged.append({'notebook_id': nb_id, 'feedback_checksum': checksum})
-    return merged
+    return tuple(
+        _Notebook(nb_id, checksums.get(nb_id)) for nb_id in notebook_ids
+    )
 
 
 def _parse_notebook_id(path, extension='.ipynb'):
@@ -42,17 +78,192 @@ def _parse_notebook_id(path, extension='.ipynb'):
     return None
 
 
+def _local_checksum(checksums, path):
+    """
+    Returns the checksum of the local feedback file at ``path`` from the
+    ChecksumCache ``checksums``, or None if there is no such file.
+    """
+    if not os.path.isfile(path):
+        return None
+    return checksums.checksum(path)
+
+
+def _group_key(info):
+    return (info['course_id'], info['student_id'], info['assignment_id'])
+
+
+def _group_submissions(submissions):
+    """
+    Groups submissions by course, student and assignment. Returns a list of
+    dictionaries with 'course_id', 'student_id', 'assignment_id', 'status'
+    and the list of 'submissions' in the group sorted by timestamp. The list
+    is sorted by course, student and assignment.
+    """
+    groups = {}
+    for info in submissions:
+        groups.setdefault(_group_key(info), []).append(info)
+
+    grouped = []
+    for key in sorted(groups):
+        group = sorted(groups[key], key=lambda x: x['timestamp'])
+        grouped.append(
+            {
+                'course_id': key[0],
+                'student_id': key[1],
+                'assignment_id': key[2],
+                'status': group[0]['status'],
+                'submissions': group,
+            }
+        )
+    return grouped
+
+
 class ExchangeList(Exchange, ABCExchangeList):
-    def _get_assignments(self, course_ids):
+    # Futures of the notebook_ids of released assignments fetched in the
+    # background, by course_id and assignment_id.
+    _notebook_futures = Dict()
+
+    result_cache = Bool(
+        False,
+        help=dedent(
+            '''
+            Whether to keep the results of listing assignments in memory. A
+            repeated list returns the previous result immediately and refreshes
+            it in the background. Submitting, fetching or releasing in this
+            process or with the same cache directory discards the results.
+            '''
+        ),
+    ).tag(config=True)
+
+    # Futures of the feedback checksums of cached submissions fetched in the
+    # background, and the checksums known to match the fetched feedback, by
+    # the path of the cached submission.
+    _feedback_futures = Dict()
+    _feedback_memo = Dict()
+
+    # The paths of the notebooks of cached submissions, by the path of the
+    # cached submission.
+    _cached_notebooks = Dict()
+
+    # The thread deleting removed cached submissions, if any.
+    _removal_thread = None
+
+    feedback_memo_ttl = Float(
+        0,
+        help=dedent(
+            '''
+            Seconds for which nbgrader list --cached assumes that the
+            feedback of a submission has not changed on the exchange once it
+            has been fetched and matches the local copy. Feedback released
+            again meanwhile is only listed as updated once this time passed.
+            Set to 0 to always check for updated feedback.
+            '''
+        ),
+    ).tag(config=True)
+
+    output_format = Enum(
+        ['text', 'ndjson'],
+        'text',
+        help=dedent(
+            '''
+            How listed assignments are reported: 'text' logs a line for
+            every assignment, 'ndjson' prints every assignment, or group of
+            submissions, as a line of JSON to stdout.
+            '''
+        ),
+    ).tag(config=True)
+
+    notebooks = Bool(
+        True,
+        help=dedent(
+            '''
+            Whether to list the notebooks of every assignment and submission
+            and the state of their feedback. If False, only the course,
+            assignment and submission listings are requested from ngshare,
+            and the details of single assignments or submissions can be
+            loaded later with load_details.
+            '''
+        ),
+    ).tag(config=True)
+
+    @property
+    def changes_list_results(self):
+        return self.remove
+
+    def start(self):
+        if not self.result_cache or self.remove:
+            return super().start()
+
+        key = self._result_cache_key()
+        token = LIST_RESULTS.token(self.cache)
+        result = LIST_RESULTS.get(key, token)
+        if result is None:
+            result = super().start()
+            LIST_RESULTS.put(key, token, result)
+        else:
+            self.log.debug('Serving cached list result, refreshing it.')
+            LIST_RESULTS.refresh(
+                key, self.cache, self._refresh_copy()._start, self.log
+            )
+        return copy.deepcopy(result)
+
+    def _start(self):
+        return super().start()
+
+    def _result_cache_key(self):
+        return (
+            self.username,
+            os.path.abspath(self.cache),
+            os.path.abspath(self.assignment_dir),
+            self.coursedir.course_id,
+            self.coursedir.assignment_id,
+            self.coursedir.student_id,
+            self.inbound,
+            self.cached,
+            self.path_includes_course,
+            self.notebooks,
+        )
+
+    def _refresh_copy(self):
+        """
+        Returns a copy of this action for refreshing its result in the
+        background. Paths are made absolute since the working directory
+        may change meanwhile.
+        """
+        coursedir = type(self.coursedir)(config=self.coursedir.config)
+        for name in self.coursedir.trait_names(config=True):
+            setattr(coursedir, name, getattr(self.coursedir, name))
+        refresh = type(self)(
+            coursedir=coursedir,
+            authenticator=self.authenticator,
+            config=self.config,
+        )
+        for name in self.trait_names(config=True):
+            setattr(refresh, name, getattr(self, name))
+        refresh.assignment_dir = os.path.abspath(self.assignment_dir)
+        refresh.cache = os.path.abspath(self.cache)
+        return refresh
+
+    def _get_assignments(self, course_ids, prefetch_notebooks=False):
         """
         Returns a list of assignments. Each assignment is a dictionary
         containing the course_id and assignment_id.
 
         ``course_ids`` - A list of course IDs.
+        ``prefetch_notebooks`` - Whether to start fetching the notebooks of
+        each assignment as soon as the assignments of its course are known.
         """
-        assignments = []
-        for course_id in course_ids:
+
+        def get_course_assignments(course_id):
             response = self.ngshare_api_get('/assignments/{}'.format(course_id))
+            if response is not None and prefetch_notebooks:
+                for assignment_id in response['assignments']:
+                    self._prefetch_notebooks(course_id, assignment_id)
+            return response
+
+        assignments = []
+        responses = self.map_concurrent(get_course_assignments, course_ids)
+        for course_id, response in zip(course_ids, responses):
             if response is None:
                 self.log.error(
                     'Failed to get assignments from course {}.'.format(
@@ -117,19 +328,139 @@ class ExchangeList(Exchange, ABCExchangeList):
             for x in response['files']
         ]
 
+    def _prefetch_feedback_checksums(self, paths):
+        """
+        Starts fetching the feedback checksums of the cached submissions at
+        ``paths`` in the background, except for memoized ones. The results
+        are used by ``_cached_feedback_checksums``.
+        """
+        self._feedback_futures = {}
+        self._feedback_memo = {}
+        if self.feedback_memo_ttl > 0:
+            now = time.time()
+            self._feedback_memo = {
+                path: entry
+                for path, entry in self._load_feedback_memo().items()
+                if now - entry['time'] < self.feedback_memo_ttl
+            }
+        if self.max_concurrent_requests <= 1:
+            return
+        for path in paths:
+            if path in self._feedback_memo:
+                continue
+            info = self.parse_assignment(path)
+            self._feedback_futures[path] = self.executor.submit(
+                self._get_feedback_checksums,
+                info['course_id'],
+                info['assignment_id'],
+                info['student_id'],
+                info['timestamp'],
+            )
+
+    def _cached_feedback_checksums(self, info, feedback_dir, checksums):
+        """
+        Returns the feedback checksums of a cached submission, from the memo
+        or the prefetched result if available. The memo is only used while
+        the local feedback in ``feedback_dir`` is unchanged.
+        """
+        entry = self._feedback_memo.get(info['path'])
+        if entry is not None:
+            if all(
+                _local_checksum(
+                    checksums,
+                    os.path.join(feedback_dir, '{}.html'.format(notebook_id)),
+                )
+                == checksum
+                for notebook_id, checksum in entry['local_checksums'].items()
+            ):
+                return entry['checksums']
+            del self._feedback_memo[info['path']]
+        future = self._feedback_futures.pop(info['path'], None)
+        if future is not None:
+            return future.result()
+        return self._get_feedback_checksums(
+            info['course_id'],
+            info['assignment_id'],
+            info['student_id'],
+            info['timestamp'],
+        )
+
+    def _memoize_feedback_checksums(
+        self, info, feedback_checksums, local_checksums
+    ):
+        if self.feedback_memo_ttl <= 0:
+            return
+        path = info['path']
+        if (
+            info['has_local_feedback']
+            and info['has_exchange_feedback']
+            and not info['feedback_updated']
+        ):
+            if path not in self._feedback_memo:
+                self._feedback_memo[path] = {
+                    'time': time.time(),
+                    'checksums': feedback_checksums,
+                    'local_checksums': local_checksums,
+                }
+        else:
+            self._feedback_memo.pop(path, None)
+
+    def _save_feedback_memo(self):
+        path = self._feedback_memo_path()
+        os.makedirs(self.cache, exist_ok=True)
+        with atomic_write(path) as f:
+            json.dump(self._feedback_memo, f)
+
+    def _local_assignment_dir(self, course_id, assignment_id):
+        if self.path_includes_course:
+            return os.path.join(self.assignment_dir, course_id, assignment_id)
+        return os.path.join(self.assignment_dir, assignment_id)
+
+    def _prefetch_notebooks(self, course_id, assignment_id):
+        """
+        Starts fetching the notebook_ids of a released assignment in the
+        background if requests are sent concurrently and the assignment has
+        not been fetched. The result is used by ``_released_notebooks``.
+        """
+        if self.max_concurrent_requests <= 1 or os.path.exists(
+            self._local_assignment_dir(course_id, assignment_id)
+        ):
+            return
+        self._notebook_futures[
+            (course_id, assignment_id)
+        ] = self.executor.submit(self._get_notebooks, course_id, assignment_id)
+
+    def _released_notebooks(self, course_id, assignment_id):
+        """
+        Returns the notebook_ids of a released assignment, from the prefetched
+        result if available.
+        """
+        future = self._notebook_futures.pop((course_id, assignment_id), None)
+        if future is None:
+            return self._get_notebooks(course_id, assignment_id)
+        return future.result()
+
     def _get_submissions(self, assignments, student_id=None):
         """
-        Returns a list of submissions. Each submission is a dictionary
-        containing the 'course_id', 'assignment_id', 'student_id', 'timestamp'
-        and a list of 'notebooks'. Each notebook is a dictionary containing a
-        'notebook_id' and 'feedback_checksum'.
+        Returns a list of _Submission, with their notebooks unless
+        ``notebooks`` is False.
 
         ``assignments`` - A list of dictionaries containing 'course_id' and
         'assignment_id'.
         ``student_id`` - Used to specify a specific student's submissions to
         get. If None, submissions from all students are fetched if permitted.
         """
-        submissions = []
+        return [
+            submission
+            for batch in self._iter_submissions(assignments, student_id)
+            for submission in batch
+        ]
+
+    def _iter_submissions(self, assignments, student_id=None):
+        """
+        Like ``_get_submissions``, but yields the list of submissions of every
+        assignment as soon as they have been fetched.
+        """
         for assignment in assignments:
             course_id = assignment['course_id']
             assignment_id = assignment['assignment_id']
@@ -143,13 +474,42 @@ class ExchangeList(Exchange, ABCExchangeList):
                 self.log.error('Failed to get submisions for assignment {}.')
                 continue
 
-            for submission in response['submissions']:
-                notebook_ids = self._get_submission_notebooks(
+            if not self.notebooks:
+                yield [
+                    _Submission(
+                        course_id,
+                        assignment_id,
+                        x['student_id'],
+                        x['timestamp'],
+                    )
+                    for x in response['submissions']
+                ]
+                continue
+
+            # Submissions never change, so their notebooks are only listed
+            # the first time they are seen.
+            cursor = self._load_cursor(course_id, assignment_id)
+            seen = {
+                (x['student_id'], x['timestamp']): cursor.get(
+                    x['student_id'], {}
+                ).get(x['timestamp'])
+                for x in response['submissions']
+            }
+
+            def get_details(submission):
+                return self._get_submission_details(
                     course_id,
                     assignment_id,
                     submission['student_id'],
                     submission['timestamp'],
+                    seen[(submission['student_id'], submission['timestamp'])],
                 )
+
+            details = self.map_concurrent(get_details, response['submissions'])
+            submissions = []
+            for submission, (notebook_ids, feedback_checksums) in zip(
+                response['submissions'], details
+            ):
                 if notebook_ids is None:
                     self.log.error(
                         'Failed to list notebooks in submission '
@@ -161,12 +521,9 @@ class ExchangeList(Exchange, ABCExchangeList):
                         )
                     )
                     continue
-                feedback_checksums = self._get_feedback_checksums(
-                    course_id,
-                    assignment_id,
-                    submission['student_id'],
-                    submission['timestamp'],
-                )
+                cursor.setdefault(submission['student_id'], {})[
+                    submission['timestamp']
+                ] = notebook_ids
                 if feedback_checksums is None:
                     self.log.error('Failed to check for feedback.')
                     feedback_checksums = {}
@@ -174,16 +531,82 @@ class ExchangeList(Exchange, ABCExchangeList):
                     notebook_ids, feedback_checksums
                 )
                 submissions.append(
-                    {
-                        'course_id': course_id,
-                        'assignment_id': assignment_id,
-                        'student_id': submission['student_id'],
-                        'timestamp': submission['timestamp'],
-                        'notebooks': notebooks,
-                    }
+                    _Submission(
+                        course_id,
+                        assignment_id,
+                        submission['student_id'],
+                        submission['timestamp'],
+                        notebooks,
+                    )
                 )
 
-        return submissions
+            if student_id is None:
+                # Forget submissions that are no longer listed.
+                cursor = {
+                    student: {
+                        timestamp: notebook_ids
+                        for timestamp, notebook_ids in timestamps.items()
+                        if (student, timestamp) in seen
+                    }
+                    for student, timestamps in cursor.items()
+                }
+            self._save_cursor(course_id, assignment_id, cursor)
+            yield submissions
+
+    def _get_submission_details(
+        self, course_id, assignment_id, student_id, timestamp, notebook_ids
+    ):
+        """
+        Returns the notebook_ids and the feedback checksums of a submission,
+        listing its notebooks unless ``notebook_ids`` are already known. The
+        notebook_ids are None if they cannot be listed, and the checksums
+        are None if the feedback cannot be checked.
+        """
+        if notebook_ids is None:
+            notebook_ids = self._get_submission_notebooks(
+                course_id, assignment_id, student_id, timestamp
+            )
+        if notebook_ids is None:
+            return None, None
+        feedback_checksums = self._get_feedback_checksums(
+            course_id, assignment_id, student_id, timestamp
+        )
+        return notebook_ids, feedback_checksums
+
+    def _cursor_path(self, course_id, assignment_id):
+        return os.path.join(
+            self.cache,
+            '.inbound',
+            quote(course_id, safe=''),
+            quote(assignment_id, safe='') + '.json',
+        )
+
+    def _load_cursor(self, course_id, assignment_id):
+        """
+        Returns the notebook_ids of the submissions of an assignment listed
+        before, as a dictionary mapping student_ids to dictionaries mapping
+        timestamps to lists of notebook_ids.
+        """
+        try:
+            with open(self._cursor_path(course_id, assignment_id)) as f:
+                cursor = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return cursor if isinstance(cursor, dict) else {}
+
+    def _save_cursor(self, course_id, assignment_id, cursor):
+        path = self._cursor_path(course_id, assignment_id)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_write(path) as f:
+                json.dump(cursor, f)
+        except OSError:
+            self.log.warning(
+                'Failed to save the submissions of {}/{}.'.format(
+                    course_id, assignment_id
+                ),
+                exc_info=True,
+            )
 
     def _get_submission_notebooks(
         self, course_id, assignment_id, student_id, timestamp
@@ -216,9 +639,11 @@ class ExchangeList(Exchange, ABCExchangeList):
 
         return self.ngshare_api_delete(url)
 
+    @traced
     def init_src(self):
         pass
 
+    @traced
     def init_dest(self):
         course_id = (
             self.coursedir.course_id if self.coursedir.course_id else '*'
@@ -238,25 +663,33 @@ class ExchangeList(Exchange, ABCExchangeList):
                 self.fail('Failed to get courses.')
         else:
             courses = [course_id]
+        # Notebooks are only prefetched if they are listed.
+        outbound = not (self.inbound or self.cached) and self.notebooks
+        self._notebook_futures = {}
         if assignment_id == '*':
-            assignments = self._get_assignments(courses)
+            assignments = self._get_assignments(
+                courses, prefetch_notebooks=outbound
+            )
         else:
             assignments = [
                 {'course_id': course, 'assignment_id': assignment_id}
                 for course in courses
             ]
+            if outbound:
+                for course in courses:
+                    self._prefetch_notebooks(course, assignment_id)
 
         if self.inbound:
             if student_id == '*':
                 student_id = None
-            self.assignments = self._get_submissions(assignments, student_id)
+            # Fetched while the submissions are listed, see iter_assignments.
+            self.assignments = self._iter_submissions(assignments, student_id)
         elif self.cached:
-            pattern = os.path.join(
-                self.cache,
-                course_id,
-                '{}+{}+*'.format(student_id, assignment_id),
+            cached = self._cached_submissions(
+                course_id, student_id, assignment_id
             )
-            self.assignments = sorted(glob.glob(pattern))
+            self.assignments = [path for path, _ in cached]
+            self._cached_notebooks = dict(cached)
             if student_id == '*':
                 student_id = None
         else:
@@ -265,10 +698,10 @@ class ExchangeList(Exchange, ABCExchangeList):
     def parse_assignment(self, assignment):
         if self.inbound:
             return {
-                'course_id': assignment['course_id'],
-                'student_id': assignment['student_id'],
-                'assignment_id': assignment['assignment_id'],
-                'timestamp': assignment['timestamp'],
+                'course_id': assignment.course_id,
+                'student_id': assignment.student_id,
+                'assignment_id': assignment.assignment_id,
+                'timestamp': assignment.timestamp,
             }
         elif self.cached:
             regexp = r'.*/(?P<course_id>.*)/(?P<student_id>.*)\+(?P<assignment_id>.*)\+(?P<timestamp>.*)'
@@ -286,7 +719,7 @@ class ExchangeList(Exchange, ABCExchangeList):
         msg = '{course_id} {student_id} {assignment_id} {timestamp}'.format(
             **info
         )
-        if info['status'] == 'submitted':
+        if info['status'] == 'submitted' and 'has_local_feedback' in info:
             if info['has_local_feedback'] and not info['feedback_updated']:
                 msg += ' (feedback already fetched)'
             elif info['has_exchange_feedback']:
@@ -301,10 +734,16 @@ class ExchangeList(Exchange, ABCExchangeList):
             msg += ' (already downloaded)'
         return msg
 
+    @traced
     def copy_files(self):
         pass
 
-    def parse_assignments(self):
+    def iter_assignments(self):
+        """
+        Yields the same assignments as ``parse_assignments``, each as soon as
+        its data is complete. Inbound submissions are fetched and yielded one
+        assignment at a time, so their groups are only sorted per assignment.
+        """
         if self.coursedir.student_id:
             courses = self.authenticator.get_student_courses(
                 self.coursedir.student_id
@@ -312,22 +751,137 @@ class ExchangeList(Exchange, ABCExchangeList):
         else:
             courses = None
 
-        assignments = []
-        for assignment in self.assignments:
+        if self.inbound:
+            batches = self._submission_batches()
+        elif self.cached:
+            key = lambda x: _group_key(self.parse_assignment(x))
+            cached = sorted(self.assignments, key=key)
+            if self.notebooks:
+                self._prefetch_feedback_checksums(cached)
+            batches = (
+                list(group) for _, group in itertools.groupby(cached, key=key)
+            )
+        else:
+            batches = ([x] for x in self.assignments)
+        checksums = ChecksumCache(
+            os.path.join(self.cache, '.feedback_checksums.json')
+        )
+        try:
+            for batch in batches:
+                infos = list(self._iter_parsed(batch, courses, checksums))
+                if self.inbound or self.cached:
+                    yield from _group_submissions(infos)
+                else:
+                    yield from infos
+        finally:
+            try:
+                checksums.save()
+                if (
+                    self.cached
+                    and self.notebooks
+                    and self.feedback_memo_ttl > 0
+                ):
+                    self._save_feedback_memo()
+            except OSError:
+                self.log.warning(
+                    'Failed to save feedback checksums.', exc_info=True
+                )
+
+    def _submission_batches(self):
+        """
+        Yields the inbound submissions of every assignment, fetching them on
+        the first call.
+        """
+        if isinstance(self.assignments, list):
+            for _, batch in itertools.groupby(
+                self.assignments,
+                key=lambda x: (x.course_id, x.assignment_id),
+            ):
+                yield list(batch)
+            return
+        submissions = []
+        for batch in self.assignments:
+            submissions += batch
+            yield batch
+        self.assignments = submissions
+
+    def load_details(self, info):
+        """
+        Adds the notebooks, and for submissions the state of their feedback,
+        to an assignment or a single submission listed with ``notebooks``
+        set to False. Returns ``info``.
+        """
+        if self.inbound:
+            course_id = info['course_id']
+            assignment_id = info['assignment_id']
+            student_id = info['student_id']
+            timestamp = info['timestamp']
+            cursor = self._load_cursor(course_id, assignment_id)
+            notebook_ids, feedback_checksums = self._get_submission_details(
+                course_id,
+                assignment_id,
+                student_id,
+                timestamp,
+                cursor.get(student_id, {}).get(timestamp),
+            )
+            if notebook_ids is None:
+                self.log.error(
+                    'Failed to list notebooks in submission '
+                    '{}/{} from student {} (timestamp {})'.format(
+                        course_id, assignment_id, student_id, timestamp
+                    )
+                )
+                notebook_ids = []
+            if feedback_checksums is None:
+                self.log.error('Failed to check for feedback.')
+                feedback_checksums = {}
+            assignment = _Submission(
+                course_id,
+                assignment_id,
+                student_id,
+                timestamp,
+                _merge_notebooks_feedback(notebook_ids, feedback_checksums),
+            )
+        elif self.cached:
+            assignment = info['path']
+        else:
+            assignment = {
+                'course_id': info['course_id'],
+                'assignment_id': info['assignment_id'],
+            }
+
+        checksums = ChecksumCache(
+            os.path.join(self.cache, '.feedback_checksums.json')
+        )
+        try:
+            info.update(
+                next(self._iter_parsed([assignment], None, checksums, True))
+            )
+        finally:
+            try:
+                checksums.save()
+            except OSError:
+                self.log.warning(
+                    'Failed to save feedback checksums.', exc_info=True
+                )
+        return info
+
+    def _iter_parsed(self, assignments, courses, checksums, details=None):
+        """
+        Yields the info of each of ``assignments`` that belongs to one of
+        ``courses``, including their notebooks if ``details`` is True, or by
+        default if ``notebooks`` is True.
+        """
+        if details is None:
+            details = self.notebooks
+        for assignment in assignments:
             info = self.parse_assignment(assignment)
             if courses is not None and info['course_id'] not in courses:
                 continue
 
-            if self.path_includes_course:
-                assignment_dir = os.path.join(
-                    self.assignment_dir,
-                    info['course_id'],
-                    info['assignment_id'],
-                )
-            else:
-                assignment_dir = os.path.join(
-                    self.assignment_dir, info['assignment_id']
-                )
+            assignment_dir = self._local_assignment_dir(
+                info['course_id'], info['assignment_id']
+            )
 
             if self.inbound or self.cached:
                 info['status'] = 'submitted'
@@ -342,18 +896,22 @@ class ExchangeList(Exchange, ABCExchangeList):
             if self.remove:
                 info['status'] = 'removed'
 
-            if self.cached or info['status'] == 'fetched':
+            if not details:
+                yield info
+                continue
+
+            if self.cached:
+                notebooks = self._cached_notebooks[assignment]
+            elif info['status'] == 'fetched':
                 notebooks = sorted(
                     glob.glob(os.path.join(info['path'], '*.ipynb'))
                 )
             elif self.inbound:
-
-                def nb_key(nb):
-                    return nb['notebook_id']
-
-                notebooks = sorted(assignment['notebooks'], key=nb_key)
+                notebooks = sorted(
+                    assignment.notebooks, key=lambda nb: nb.notebook_id
+                )
             else:
-                notebooks = self._get_notebooks(
+                notebooks = self._released_notebooks(
                     info['course_id'], info['assignment_id']
                 )
                 if notebooks is None:
@@ -372,14 +930,14 @@ class ExchangeList(Exchange, ABCExchangeList):
                 )
 
             if self.cached:
-                feedback_checksums = self._get_feedback_checksums(
-                    info['course_id'],
-                    info['assignment_id'],
-                    info['student_id'],
-                    info['timestamp'],
+                feedback_checksums = self._cached_feedback_checksums(
+                    info,
+                    os.path.join(assignment_dir, 'feedback', info['timestamp']),
+                    checksums,
                 )
                 if feedback_checksums is None:
                     feedback_checksums = {}
+                local_checksums = {}
 
             info['notebooks'] = []
             for notebook in notebooks:
@@ -391,7 +949,7 @@ class ExchangeList(Exchange, ABCExchangeList):
                         'path': os.path.abspath(notebook),
                     }
                 elif self.inbound:
-                    nb_info = {'notebook_id': notebook['notebook_id']}
+                    nb_info = {'notebook_id': notebook.notebook_id}
                 else:
                     nb_info = {'notebook_id': notebook}
                 if info['status'] != 'submitted':
@@ -411,17 +969,17 @@ class ExchangeList(Exchange, ABCExchangeList):
                     local_feedback_dir,
                     '{0}.html'.format(nb_info['notebook_id']),
                 )
-                has_local_feedback = os.path.isfile(local_feedback_path)
-                if has_local_feedback:
-                    local_feedback_checksum = _checksum(local_feedback_path)
-                else:
-                    local_feedback_checksum = None
+                local_feedback_checksum = _local_checksum(
+                    checksums, local_feedback_path
+                )
+                has_local_feedback = local_feedback_checksum is not None
 
                 # Also look to see if there is feedback available to fetch.
                 if self.cached:
                     has_exchange_feedback = False
                     exchange_feedback_checksum = None
                     notebook_id = nb_info['notebook_id']
+                    local_checksums[notebook_id] = local_feedback_checksum
                     if notebook_id in feedback_checksums.keys():
                         has_exchange_feedback = True
                         exchange_feedback_checksum = feedback_checksums[
@@ -429,13 +987,11 @@ class ExchangeList(Exchange, ABCExchangeList):
                         ]
                 else:  # self.inbound
                     has_exchange_feedback = (
-                        notebook['feedback_checksum'] is not None
-                        and notebook['feedback_checksum'] != ''
+                        notebook.feedback_checksum is not None
+                        and notebook.feedback_checksum != ''
                     )
                     if has_exchange_feedback:
-                        exchange_feedback_checksum = notebook[
-                            'feedback_checksum'
-                        ]
+                        exchange_feedback_checksum = notebook.feedback_checksum
                     else:
                         exchange_feedback_checksum = None
 
@@ -452,16 +1008,13 @@ class ExchangeList(Exchange, ABCExchangeList):
             if info['status'] == 'submitted':
                 if info['notebooks']:
                     has_local_feedback = all(
-                        [nb['has_local_feedback'] for nb in info['notebooks']]
+                        nb['has_local_feedback'] for nb in info['notebooks']
                     )
                     has_exchange_feedback = all(
-                        [
-                            nb['has_exchange_feedback']
-                            for nb in info['notebooks']
-                        ]
+                        nb['has_exchange_feedback'] for nb in info['notebooks']
                     )
                     feedback_updated = any(
-                        [nb['feedback_updated'] for nb in info['notebooks']]
+                        nb['feedback_updated'] for nb in info['notebooks']
                     )
                 else:
                     has_local_feedback = False
@@ -478,86 +1031,115 @@ class ExchangeList(Exchange, ABCExchangeList):
                 else:
                     info['local_feedback_path'] = None
 
-            assignments.append(info)
+                if self.cached:
+                    self._memoize_feedback_checksums(
+                        info, feedback_checksums, local_checksums
+                    )
 
-        # partition the assignments into groups for course/student/assignment
-        if self.inbound or self.cached:
-            _get_key = lambda info: (
-                info['course_id'],
-                info['student_id'],
-                info['assignment_id'],
-            )
-            _match_key = lambda info, key: (
-                info['course_id'] == key[0]
-                and info['student_id'] == key[1]
-                and info['assignment_id'] == key[2]
-            )
-            assignment_keys = sorted(
-                list(set([_get_key(info) for info in assignments]))
-            )
-            assignment_submissions = []
-            for key in assignment_keys:
-                submissions = [x for x in assignments if _match_key(x, key)]
-                submissions = sorted(submissions, key=lambda x: x['timestamp'])
-                info = {
-                    'course_id': key[0],
-                    'student_id': key[1],
-                    'assignment_id': key[2],
-                    'status': submissions[0]['status'],
-                    'submissions': submissions,
-                }
-                assignment_submissions.append(info)
-            assignments = assignment_submissions
+            yield info
 
+    @traced
+    def parse_assignments(self):
+        assignments = list(self.iter_assignments())
+        if self.inbound or self.cached:
+            assignments.sort(key=_group_key)
         return assignments
 
-    def list_files(self):
-        '''List files.'''
-        assignments = self.parse_assignments()
+    def _stream_assignments(self, submitted_header, released_header):
+        """
+        Logs the assignments while they are parsed, or prints them as JSON
+        lines if ``output_format`` is 'ndjson'. Returns the same list as
+        ``parse_assignments``.
+        """
+        ndjson = self.output_format == 'ndjson'
+        if not ndjson:
+            self.log.info(
+                submitted_header
+                if self.inbound or self.cached
+                else released_header
+            )
 
-        if self.inbound or self.cached:
-            self.log.info('Submitted assignments:')
-            for assignment in assignments:
+        assignments = []
+        for assignment in self.iter_assignments():
+            if ndjson:
+                print(json.dumps(assignment), flush=True)
+            elif self.inbound or self.cached:
                 for info in assignment['submissions']:
                     self.log.info(self.format_inbound_assignment(info))
-        else:
-            self.log.info('Released assignments:')
-            for info in assignments:
-                self.log.info(self.format_outbound_assignment(info))
+            else:
+                self.log.info(self.format_outbound_assignment(assignment))
+            assignments.append(assignment)
 
+        if self.inbound or self.cached:
+            assignments.sort(key=_group_key)
         return assignments
 
+    @traced
+    def list_files(self):
+        '''List files.'''
+        return self._stream_assignments(
+            'Submitted assignments:', 'Released assignments:'
+        )
+
+    @traced
     def remove_files(self):
         '''List and remove files.'''
-        assignments = self.parse_assignments()
-
-        if self.inbound or self.cached:
-            self.log.info('Removing submitted assignments:')
-            for assignment in assignments:
-                for info in assignment['submissions']:
-                    self.log.info(self.format_inbound_assignment(info))
-        else:
-            self.log.info('Removing released assignments:')
-            for info in assignments:
-                self.log.info(self.format_outbound_assignment(info))
+        assignments = self._stream_assignments(
+            'Removing submitted assignments:', 'Removing released assignments:'
+        )
 
         if self.cached:
-            for assignment in self.assignments:
-                shutil.rmtree(assignment)
+            self._remove_cached(self.assignments)
         elif self.inbound:
             self.log.warning(
                 'ngshare does not support removing submissions.'
             )  # TODO
         else:
-            for assignment in self.assignments:
-                retvalue = self._unrelease_assignment(
+            retvalues = self.map_concurrent(
+                lambda x: self._unrelease_assignment(
+                    x['course_id'], x['assignment_id']
+                ),
+                self.assignments,
+            )
+            for assignment, retvalue in zip(self.assignments, retvalues):
+                name = '{}/{}'.format(
                     assignment['course_id'], assignment['assignment_id']
                 )
                 if retvalue is None:
                     self.log.error(
-                        'Failed to remove assignment {}/{}.'.format(
-                            assignment['course_id'], assignment['assignment_id']
-                        )
+                        'Failed to remove assignment {}.'.format(name)
                     )
+                else:
+                    self.log.info('Removed assignment {}.'.format(name))
 
         return assignments
+
+    def _remove_cached(self, paths):
+        """
+        Removes cached submissions by renaming them to hidden ".trash-"
+        directories, which are deleted in the background together with any
+        left over from earlier removals.
+        """
+        course_dirs = set()
+        for path in paths:
+            head, name = os.path.split(path)
+            trash_path = os.path.join(
+                head, '.trash-{}-{}'.format(os.getpid(), name)
+            )
+            try:
+                os.rename(path, trash_path)
+            except OSError as e:
+                self.log.error(
+                    'Failed to remove cached submission {}: {}'.format(path, e)
+                )
+                continue
+            self.log.info('Removed cached submission {}.'.format(path))
+            course_dirs.add(head)
+
+        trash = []
+        for course_dir in sorted(course_dirs):
+            trash += glob.glob(os.path.join(course_dir, '.trash-*'))
+        if trash:
+            self._removal_thread = _delete_in_background(
+                trash, 'ngshare-remove'
+            )
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+
+from .atomic import atomic_write
+
+# Name of the file in Exchange.cache whose content changes whenever an
+# action changes what nbgrader list would return, so that results cached in
+# other processes of the same user are invalidated as well.
+GENERATION_FILE = '.list_generation'
+
+
+class ListResultCache:
+    """
+    Results of ExchangeList actions kept in memory, served while they are
+    refreshed in the background (stale-while-revalidate).
+
+    Every result is stored with the token that was current when its
+    computation started. A token combines a counter of this process with the
+    content of the generation file in the exchange cache directory, so
+    ``invalidate`` discards the results of all processes sharing that
+    directory. The file is created by the first process caching results, and
+    only rewritten while it exists.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._entries = {}
+        self._refreshing = {}
+
+    def token(self, cache_dir):
+        path = os.path.join(cache_dir, GENERATION_FILE)
+        try:
+            with open(path) as f:
+                marker = f.read()
+        except FileNotFoundError:
+            try:
+                marker = self._write_marker(path)
+            except OSError:
+                marker = None
+        except OSError:
+            marker = None
+        with self._lock:
+            return self._generation, marker
+
+    def invalidate(self, cache_dir):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+        path = os.path.join(cache_dir, GENERATION_FILE)
+        if os.path.exists(path):
+            self._write_marker(path)
+
+    def _write_marker(self, path):
+        marker = '{}.{}'.format(os.getpid(), time.time_ns())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_write(path) as f:
+            f.write(marker)
+        return marker
+
+    def get(self, key, token):
+        """
+        Returns the result stored for ``key`` if it is still valid for
+        ``token``, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[0] != token:
+            return None
+        return entry[1]
+
+    def put(self, key, token, result):
+        with self._lock:
+            self._entries[key] = (token, result)
+
+    def refresh(self, key, cache_dir, compute, log):
+        """
+        Calls ``compute`` on a background thread and stores its result for
+        ``key``, unless a refresh of ``key`` is running. The result is
+        discarded if ``cache_dir`` is invalidated in the meantime.
+        """
+        token = self.token(cache_dir)
+
+        def run():
+            try:
+                result = compute()
+                if self.token(cache_dir) == token:
+                    self.put(key, token, result)
+            except Exception:
+                log.warning('Failed to refresh list result.', exc_info=True)
+            finally:
+                with self._lock:
+                    del self._refreshing[key]
+
+        with self._lock:
+            if key in self._refreshing:
+                return
+            thread = threading.Thread(
+                target=run, name='ngshare-list-refresh', daemon=True
+            )
+            self._refreshing[key] = thread
+        thread.start()
+
+    def wait(self):
+        """
+        Waits until all running refreshes completed.
+        """
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join()
+
+
+LIST_RESULTS = ListResultCache()
@@ -0,0 +1,266 @@
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from .atomic import atomic_write
+
+# Names of the path parameters of each ngshare endpoint, used to turn a
+# concrete request URL back into its endpoint template.
+ENDPOINT_PARAMS = {
+    'courses': (),
+    'course': ('course',),
+    'assignments': ('course',),
+    'assignment': ('course', 'assignment'),
+    'submissions': ('course', 'assignment', 'student'),
+    'submission': ('course', 'assignment', 'student'),
+    'feedback': ('course', 'assignment', 'student'),
+    'students': ('course',),
+    'student': ('course', 'student'),
+    'instructors': ('course',),
+    'instructor': ('course', 'instructor'),
+}
+
+# Upper bounds (in seconds) of the request latency histogram buckets. The
+# last bucket of every histogram counts everything slower than these.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def endpoint_template(url):
+    """
+    Returns the endpoint template of an (unencoded) ngshare URL, e.g.
+    ``/submission/{course}/{assignment}/{student}`` for
+    ``/submission/abc101/ps1/student_1``.
+    """
+    parts = url.strip('/').split('/')
+    names = ENDPOINT_PARAMS.get(parts[0], ())
+    template = '/' + parts[0]
+    for i in range(1, len(parts)):
+        name = names[i - 1] if i <= len(names) else 'arg'
+        template += '/{' + name + '}'
+    return template
+
+
+class EndpointStats:
+    """
+    Counters of the requests sent to a single endpoint with a single method.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.status_codes = Counter()
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total_time = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def record(self, status, duration, bytes_sent, bytes_received):
+        self.count += 1
+        self.status_codes[status if status is not None else 'error'] += 1
+        if status != 200:
+            self.errors += 1
+        self.histogram[bisect_left(LATENCY_BUCKETS, duration)] += 1
+        self.total_time += duration
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'status_codes': dict(self.status_codes),
+            'latency_buckets': list(LATENCY_BUCKETS),
+            'latency_histogram': list(self.histogram),
+            'total_time': self.total_time,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+        }
+
+
+class RequestMetrics:
+    """
+    Collects metrics of the ngshare requests made by an exchange action.
+
+    Requests are grouped by method and endpoint template. Besides the bytes
+    sent and received on the wire, the size of the files encoded for upload
+    is recorded both raw and base64-encoded, so the amplification of the
+    transfer encoding can be told apart from the size of the payload.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        self.file_bytes = 0
+        self.base64_bytes = 0
+
+    def record_request(
+        self, method, template, status, duration, bytes_sent, bytes_received
+    ):
+        with self._lock:
+            key = (method, template)
+            if key not in self.endpoints:
+                self.endpoints[key] = EndpointStats()
+            self.endpoints[key].record(
+                status, duration, bytes_sent, bytes_received
+            )
+
+    def record_encoded(self, file_bytes, base64_bytes):
+        with self._lock:
+            self.file_bytes += file_bytes
+            self.base64_bytes += base64_bytes
+
+    def summary(self):
+        """
+        Returns a dictionary with the totals and the per-endpoint counters.
+        """
+        with self._lock:
+            endpoints = {
+                '{} {}'.format(*key): stats.to_dict()
+                for key, stats in sorted(self.endpoints.items())
+            }
+            file_bytes = self.file_bytes
+            base64_bytes = self.base64_bytes
+        total = {
+            'requests': sum(x['count'] for x in endpoints.values()),
+            'errors': sum(x['errors'] for x in endpoints.values()),
+            'total_time': sum(x['total_time'] for x in endpoints.values()),
+            'bytes_sent': sum(x['bytes_sent'] for x in endpoints.values()),
+            'bytes_received': sum(
+                x['bytes_received'] for x in endpoints.values()
+            ),
+            'file_bytes': file_bytes,
+            'base64_bytes': base64_bytes,
+        }
+        return {'total': total, 'endpoints': endpoints}
+
+    def format_summary(self):
+        """
+        Returns a compact human readable summary, one line per endpoint.
+        """
+        summary = self.summary()
+        total = summary['total']
+        lines = [
+            '{} requests ({} failed) in {:.3f}s, {} bytes sent, '
+            '{} bytes received'.format(
+                total['requests'],
+                total['errors'],
+                total['total_time'],
+                total['bytes_sent'],
+                total['bytes_received'],
+            )
+        ]
+        if total['file_bytes']:
+            lines.append(
+                'encoded {} file bytes as {} base64 bytes '
+                '(x{:.2f} on the wire)'.format(
+                    total['file_bytes'],
+                    total['base64_bytes'],
+                    total['bytes_sent'] / total['file_bytes'],
+                )
+            )
+        for name, stats in summary['endpoints'].items():
+            lines.append(
+                '  {}: {} calls, {}, avg {:.3f}s, {}/{} bytes '
+                'sent/received'.format(
+                    name,
+                    stats['count'],
+                    ' '.join(
+                        '{}x{}'.format(count, status)
+                        for status, count in stats['status_codes'].items()
+                    ),
+                    stats['total_time'] / stats['count'],
+                    stats['bytes_sent'],
+                    stats['bytes_received'],
+                )
+            )
+        return '\n'.join(lines)
+
+
+def _escape_label(value):
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def _format_labels(labels):
+    return ','.join(
+        '{}="{}"'.format(name, _escape_label(value))
+        for name, value in labels.items()
+    )
+
+
+def format_prometheus(labels, duration, success, counts, summary):
+    """
+    Returns the metrics of an exchange action in the Prometheus text format.
+
+    ``labels`` - A dictionary of labels added to every sample.
+    ``duration`` - The duration of the action in seconds.
+    ``success`` - Whether the action completed without an error.
+    ``counts`` - A dictionary mapping outcomes (e.g. 'processed', 'skipped',
+    'failed') to the number of submissions with that outcome.
+    ``summary`` - The summary of the RequestMetrics of the action.
+    """
+    total = summary['total']
+    samples = [
+        (
+            'duration_seconds',
+            'Duration of the last exchange action.',
+            [({}, duration)],
+        ),
+        (
+            'success',
+            'Whether the last exchange action completed without an error.',
+            [({}, int(success))],
+        ),
+        (
+            'submissions',
+            'Submissions processed by the last exchange action by result.',
+            [({'result': k}, v) for k, v in sorted(counts.items())],
+        ),
+        (
+            'requests',
+            'ngshare requests made by the last exchange action.',
+            [({}, total['requests'])],
+        ),
+        (
+            'http_errors',
+            'Failed ngshare requests of the last exchange action.',
+            [({}, total['errors'])],
+        ),
+        (
+            'bytes_sent',
+            'Bytes sent to ngshare by the last exchange action.',
+            [({}, total['bytes_sent'])],
+        ),
+        (
+            'bytes_received',
+            'Bytes received from ngshare by the last exchange action.',
+            [({}, total['bytes_received'])],
+        ),
+    ]
+    lines = []
+    for name, description, values in samples:
+        if not values:
+            continue
+        name = 'ngshare_exchange_' + name
+        lines.append('# HELP {} {}'.format(name, description))
+        lines.append('# TYPE {} gauge'.format(name))
+        for extra_labels, value in values:
+            lines.append(
+                '{}{{{}}} {}'.format(
+                    name, _format_labels(dict(labels, **extra_labels)), value
+                )
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path, content):
+    """
+    Atomically replaces the file at ``path`` with ``content``, so that the
+    Prometheus textfile collector never reads a partially written file.
+    """
+    with atomic_write(path) as f:
+        f.write(content)
@@ -6,10 +6,12 @@ from traitlets import Bool
 from nbgrader.exchange.abc import (
     ExchangeReleaseAssignment as ABCExchangeReleaseAssignment,
 )
-from .exchange import Exchange
+from .exchange import Exchange, traced
 
 
 class ExchangeReleaseAssignment(Exchange, ABCExchangeReleaseAssignment):
+    changes_list_results = True
+
     force = Bool(
         False, help='Force overwrite existing files in the exchange.'
     ).tag(config=True)
@@ -31,6 +33,7 @@ class ExchangeReleaseAssignment(Exchange, ABCExchangeReleaseAssignment):
 
         super(ExchangeReleaseAssignment, self)._load_config(cfg, **kwargs)
 
+    @traced
     def init_src(self):
         self.src_path = self.coursedir.format_path(
             self.coursedir.release_directory, '.', self.coursedir.assignment_id
@@ -57,6 +60,7 @@ class ExchangeReleaseAssignment(Exchange, ABCExchangeReleaseAssignment):
                     ),
                 )
 
+    @traced
     def init_dest(self):
         if self.coursedir.course_id == '':
             self.fail('No course id specified. Re-run with --course flag.')
@@ -64,6 +68,7 @@ class ExchangeReleaseAssignment(Exchange, ABCExchangeReleaseAssignment):
             self.coursedir.course_id, self.coursedir.assignment_id
         )
 
+    @traced
     def assignment_exists(self):
         url = '/assignments/{}'.format(self.coursedir.course_id)
         response = self.ngshare_api_get(url)
@@ -102,6 +107,7 @@ class ExchangeReleaseAssignment(Exchange, ABCExchangeReleaseAssignment):
 
         return False
 
+    @traced
     def copy_files(self):
         if not self.assignment_exists():
             self.log.info('Encoding assignment')
@@ -7,10 +7,13 @@ import json
 from nbgrader.exchange.abc import (
     ExchangeReleaseFeedback as ABCExchangeReleaseFeedback,
 )
-from .exchange import Exchange
+from .exchange import Exchange, traced
 
 
 class ExchangeReleaseFeedback(Exchange, ABCExchangeReleaseFeedback):
+    changes_list_results = True
+
+    @traced
     def init_src(self):
         student_id = (
             self.coursedir.student_id if self.coursedir.student_id else '*'
@@ -21,16 +24,19 @@ class ExchangeReleaseFeedback(Exchange, ABCExchangeReleaseFeedback):
             self.coursedir.assignment_id,
         )
 
+    @traced
     def init_dest(self):
         if self.coursedir.course_id == '':
             self.fail('No course id specified. Re-run with --course flag.')
 
+    @traced
     def copy_files(self):
         if self.coursedir.student_id_exclude:
             exclude_students = set(self.coursedir.student_id_exclude.split(','))
         else:
             exclude_students = set()
 
+        skipped_submissions = set()
         staged_feedback = {}  # Maps student IDs to submissions.
         html_files = glob.glob(os.path.join(self.src_path, '*.html'))
         for html_file in html_files:
@@ -58,16 +64,17 @@ class ExchangeReleaseFeedback(Exchange, ABCExchangeReleaseFeedback):
             gd = m.groupdict()
             student_id = gd['student_id']
             notebook_id = gd['notebook_id']
-            if student_id in exclude_students:
-                self.log.debug('Skipping student "{}"'.format(student_id))
-                continue
-
             feedback_dir = os.path.split(html_file)[0]
             with open(
                 os.path.join(feedback_dir, 'timestamp.txt')
             ) as timestamp_file:
                 timestamp = timestamp_file.read()
 
+            if student_id in exclude_students:
+                self.log.debug('Skipping student "{}"'.format(student_id))
+                skipped_submissions.add((student_id, timestamp))
+                continue
+
             if student_id not in staged_feedback.keys():
                 # Maps timestamp to feedback.
                 staged_feedback[student_id] = {}
@@ -77,6 +84,12 @@ class ExchangeReleaseFeedback(Exchange, ABCExchangeReleaseFeedback):
             staged_feedback[student_id][timestamp].append(
                 {'notebook_id': notebook_id, 'path': html_file}
             )
+        self.submission_counts['skipped'] += len(skipped_submissions)
+        self._forget_feedback_memo(
+            self.coursedir.course_id,
+            self.coursedir.assignment_id,
+            self.coursedir.student_id or '*',
+        )
         # Student.
         for student_id, submission in staged_feedback.items():
             # Submission.
@@ -95,10 +108,13 @@ class ExchangeReleaseFeedback(Exchange, ABCExchangeReleaseFeedback):
                     student_id, timestamp, feedback_info
                 )
                 if retvalue is None:
+                    self.submission_counts['failed'] += 1
                     self.fail('Failed to upload feedback to server.')
                 else:
+                    self.submission_counts['processed'] += 1
                     self.log.info('Feedback released.')
 
+    @traced
     def post_feedback(self, student_id, timestamp, feedback_info):
         """
         Uploads feedback files for a specific submission.
@@ -123,7 +139,12 @@ class ExchangeReleaseFeedback(Exchange, ABCExchangeReleaseFeedback):
     def encode_file(self, filesystem_path, assignment_path):
         with open(filesystem_path, 'rb') as f:
             content = f.read()
-        return {
-            'path': assignment_path,
-            'content': base64.encodebytes(content).decode(),
-        }
+        encoded = base64.encodebytes(content)
+        self.metrics.record_encoded(len(content), len(encoded))
+        self.hooks.emit(
+            'on_file_encoded',
+            path=filesystem_path,
+            size=len(content),
+            encoded_size=len(encoded),
+        )
+        return {'path': assignment_path, 'content': encoded.decode()}
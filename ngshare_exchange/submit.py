@@ -1,11 +1,15 @@
 import os
+import sqlite3
 
 from nbgrader.exchange.abc import ExchangeSubmit as ABCExchangeSubmit
-from .exchange import Exchange
+from .cache_index import CacheIndex
+from .exchange import Exchange, traced
 from nbgrader.utils import find_all_notebooks
 
 
 class ExchangeSubmit(Exchange, ABCExchangeSubmit):
+    changes_list_results = True
+
     def _get_assignment_notebooks(self, course_id, assignment_id):
         """
         Returns a list of relative paths for all files in the assignment.
@@ -23,6 +27,7 @@ class ExchangeSubmit(Exchange, ABCExchangeSubmit):
             if os.path.splitext(x['path'])[1] == '.ipynb'
         ]
 
+    @traced
     def init_src(self):
         if self.path_includes_course:
             root = os.path.join(
@@ -39,6 +44,7 @@ class ExchangeSubmit(Exchange, ABCExchangeSubmit):
                 self.src_path, os.path.abspath(other_path)
             )
 
+    @traced
     def init_dest(self):
         if self.coursedir.course_id == '':
             self.fail('No course id specified. Re-run with --course flag.')
@@ -50,6 +56,7 @@ class ExchangeSubmit(Exchange, ABCExchangeSubmit):
                 'not possible with ngshare.'
             )
 
+    @traced
     def check_filename_diff(self):
         released_notebooks = self._get_assignment_notebooks(
             self.coursedir.course_id, self.coursedir.assignment_id
@@ -97,6 +104,7 @@ class ExchangeSubmit(Exchange, ABCExchangeSubmit):
                     ''.format(self.coursedir.assignment_id, diff_msg)
                 )
 
+    @traced
     def post_submission(self, src_path):
         encoded_dir = self.encode_dir(src_path, ignore=self.ignore_patterns())
         url = '/submission/{}/{}'.format(
@@ -108,6 +116,7 @@ class ExchangeSubmit(Exchange, ABCExchangeSubmit):
             return None
         return response['timestamp']
 
+    @traced
     def copy_files(self):
         self.log.info('Source: {}'.format(self.src_path))
 
@@ -130,6 +139,13 @@ class ExchangeSubmit(Exchange, ABCExchangeSubmit):
         self.do_copy(self.src_path, cache_path)
         with open(os.path.join(cache_path, 'timestamp.txt'), 'w') as fh:
             fh.write(self.timestamp)
+        try:
+            CacheIndex(self.cache).add(self.coursedir.course_id, cache_path)
+        except (sqlite3.Error, OSError):
+            self.log.warning(
+                'Failed to update the index of the submission cache.',
+                exc_info=True,
+            )
 
         self.log.info(
             'Submitted as: {} {} {}'.format(
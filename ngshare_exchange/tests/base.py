@@ -1,3 +1,5 @@
+from collections import Counter
+from fnmatch import fnmatchcase
 from logging import getLogger
 from pathlib import Path
 import urllib
@@ -9,6 +11,7 @@ from requests_mock import Mocker
 
 from nbgrader.coursedir import CourseDirectory
 from .. import Exchange
+from ..metrics import endpoint_template
 
 
 def parse_body(body: str):
@@ -63,6 +66,41 @@ class TestExchange:
             rq_mock.ANY, rq_mock.ANY, text=self._mock_all
         )
 
+    def count_requests(self):
+        """
+        Returns a Counter mapping 'METHOD /endpoint/{template}' to the number of
+        requests made to ngshare so far in the test.
+        """
+        counts = Counter()
+        for request in self.requests_mocker.request_history:
+            if not request.url.startswith(self.base_url + '/'):
+                continue
+            path = urllib.parse.unquote(
+                urllib.parse.urlsplit(request.url[len(self.base_url) :]).path
+            )
+            counts[request.method + ' ' + endpoint_template(path)] += 1
+        return counts
+
+    def assert_request_budget(self, budget):
+        """
+        Asserts that the requests made to ngshare so far in the test stay within
+        ``budget``, a dictionary mapping 'METHOD /endpoint/{template}' patterns
+        (in fnmatch syntax) to the maximum number of requests matching them.
+        Requests to endpoints matching no pattern are not allowed at all.
+        """
+        counts = self.count_requests()
+        for endpoint in counts:
+            assert any(
+                fnmatchcase(endpoint, pattern) for pattern in budget
+            ), 'Unexpected requests to {}'.format(endpoint)
+        for pattern, limit in budget.items():
+            count = sum(v for k, v in counts.items() if fnmatchcase(k, pattern))
+            assert (
+                count <= limit
+            ), '{} requests to {}, expected at most {}'.format(
+                count, pattern, limit
+            )
+
     def mock_404(self):
         self.requests_mocker.register_uri(
             rq_mock.ANY, rq_mock.ANY, status_code=404
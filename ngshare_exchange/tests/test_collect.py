@@ -1,17 +1,29 @@
 import base64
+import hashlib
+import json
+import logging
 import os
+import socket
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 from requests import PreparedRequest
 
 from .base import parse_body, TestExchange
 from nbgrader.exchange import ExchangeError
-from .. import ExchangeCollect
+from .. import collect, exchange, ExchangeCollect
+from .. import json_stream
+from ..json_stream import decode_files
 from nbgrader.utils import parse_utc
 
 
 class TestExchangeCollect(TestExchange):
     def _get_submission(self, request: PreparedRequest, context):
+        query = request.qs
         request = parse_body(request.body)
         timestamp = None
         try:
@@ -26,8 +38,14 @@ class TestExchangeCollect(TestExchange):
             assert timestamp == str(time.year) + self.timestamp_template
         except Exception:
             return {'success': False, 'message': 'Submission not found'}
-        content = base64.b64encode(self._notebook_content()).decode()
-        files = [{'path': self.notebook_id + '.ipynb', 'content': content}]
+        path = self.notebook_id + '.ipynb'
+        content = self._notebook_content()
+        if query.get('list_only') == ['true']:
+            checksum = hashlib.md5(content).hexdigest()
+            files = [{'path': path, 'checksum': checksum}]
+        else:
+            content = base64.b64encode(content).decode()
+            files = [{'path': path, 'content': content}]
         return {'success': True, 'timestamp': timestamp, 'files': files}
 
     def _get_submissions(self, request: PreparedRequest, context):
@@ -226,3 +244,500 @@ class TestExchangeCollect(TestExchange):
         self.num_submissions = 1
         self._mock_requests_error_submission()
         self.collect.start()
+
+    def test_prometheus_textfile(self, tmp_path):
+        self.num_submissions = 1
+        self._mock_requests_collect()
+        self.collect.prometheus_textfile_dir = str(tmp_path)
+        self.collect.start()
+        self.collect.start()
+        path = tmp_path / 'ngshare_exchange_collect_{}_{}.prom'.format(
+            self.course_id, self.assignment_id
+        )
+        assert [x.name for x in tmp_path.iterdir()] == [path.name]
+        labels = 'action="collect",course="{}",assignment="{}"'.format(
+            self.course_id, self.assignment_id
+        )
+        lines = path.read_text().splitlines()
+        assert 'ngshare_exchange_success{%s} 1' % labels in lines
+        assert (
+            'ngshare_exchange_submissions{%s,result="skipped"} 1' % labels
+            in lines
+        )
+        assert 'ngshare_exchange_http_errors{%s} 0' % labels in lines
+
+    def test_submission_counts(self):
+        self.num_submissions = 1
+        self._mock_requests_collect()
+        self.collect.start()
+        assert self.collect.submission_counts == {'processed': 1}
+
+    def test_submission_counts_error(self):
+        self.num_submissions = 1
+        self._mock_requests_error_submission()
+        self.collect.start()
+        assert self.collect.submission_counts == {'failed': 1}
+        assert self.collect.metrics.summary()['total']['errors'] == 1
+
+    def test_collect_request_budget(self):
+        self.num_submissions = 3
+        self._mock_requests_collect()
+        self.collect.start()
+        self.assert_request_budget(
+            {
+                'GET /submissions/{course}/{assignment}': 1,
+                'GET /submission/{course}/{assignment}/{student}': 1,
+            }
+        )
+
+    def test_collect_request_budget_students(self):
+        num_students = 5
+        self.num_submissions = 1
+        url = '{}/submissions/{}/{}'.format(
+            self.base_url, self.course_id, self.assignment_id
+        )
+        timestamp = '2001' + self.timestamp_template
+        submissions = [
+            {'student_id': 'student_{}'.format(i), 'timestamp': timestamp}
+            for i in range(num_students)
+        ]
+        self.requests_mocker.get(
+            url, json={'success': True, 'submissions': submissions}
+        )
+        for submission in submissions:
+            url = '{}/submission/{}/{}/{}'.format(
+                self.base_url,
+                self.course_id,
+                self.assignment_id,
+                submission['student_id'],
+            )
+            self.requests_mocker.get(url, json=self._get_submission)
+        self.collect.start()
+        self.assert_request_budget(
+            {
+                'GET /submissions/{course}/{assignment}': 1,
+                'GET /submission/{course}/{assignment}/{student}': num_students,
+            }
+        )
+
+    def _mock_students(self, student_ids, failing=()):
+        url = '{}/submissions/{}/{}'.format(
+            self.base_url, self.course_id, self.assignment_id
+        )
+        timestamp = '2001' + self.timestamp_template
+        submissions = [
+            {'student_id': x, 'timestamp': timestamp} for x in student_ids
+        ]
+        self.requests_mocker.get(
+            url, json={'success': True, 'submissions': submissions}
+        )
+        thread_names = []
+
+        def get_submission(request, context):
+            thread_names.append(threading.current_thread().name)
+            return self._get_submission(request, context)
+
+        for student_id in student_ids:
+            url = '{}/submission/{}/{}/{}'.format(
+                self.base_url, self.course_id, self.assignment_id, student_id
+            )
+            if student_id in failing:
+                self.requests_mocker.get(url, status_code=404)
+            else:
+                self.requests_mocker.get(url, json=get_submission)
+        return thread_names
+
+    def test_collect_concurrent(self):
+        self.num_submissions = 1
+        student_ids = ['student_{}'.format(i) for i in range(5)]
+        thread_names = self._mock_students(student_ids)
+        self.collect.start()
+        assert len(thread_names) == len(student_ids)
+        assert all(name.startswith('ngshare') for name in thread_names)
+        for student_id in student_ids:
+            assert (
+                self.course_dir
+                / 'submitted'
+                / student_id
+                / self.assignment_id
+                / 'timestamp.txt'
+            ).is_file()
+
+    def test_collect_failure_summary(self, caplog):
+        caplog.set_level(logging.INFO)
+        self.num_submissions = 1
+        student_ids = ['student_{}'.format(i) for i in range(4)]
+        self._mock_students(student_ids, failing=('student_1', 'student_3'))
+        self.collect.start()
+        assert self.collect.submission_counts == {'processed': 2, 'failed': 2}
+        messages = [x.getMessage() for x in caplog.records]
+        assert messages[-1] == (
+            'Failed to download 2 submissions of "{}" for course "{}": '
+            'student_1, student_3'.format(self.assignment_id, self.course_id)
+        )
+        collecting = [x for x in messages if x.startswith('Collecting')]
+        assert collecting == [
+            'Collecting submission: {} {}'.format(x, self.assignment_id)
+            for x in student_ids
+        ]
+
+    def test_collect_error_summary(self, caplog):
+        caplog.set_level(logging.INFO)
+        self.num_submissions = 1
+        student_ids = ['student_{}'.format(i) for i in range(3)]
+        self._mock_students(student_ids)
+        download_submission = self.collect._download_submission
+
+        def failing_download(student_id, assignment_id, path):
+            if student_id == 'student_1':
+                raise PermissionError()
+            return download_submission(student_id, assignment_id, path)
+
+        with patch.object(
+            self.collect, '_download_submission', failing_download
+        ):
+            self.collect.start()
+        assert self.collect.submission_counts == {'processed': 2, 'failed': 1}
+        errors = [x for x in caplog.records if x.levelno == logging.ERROR]
+        assert errors[0].exc_info[0] is PermissionError
+        assert errors[-1].getMessage() == (
+            'Failed to download 1 submissions of "{}" for course "{}": '
+            'student_1'.format(self.assignment_id, self.course_id)
+        )
+        assert not list(
+            (self.course_dir / 'submitted' / 'student_1').glob('.*')
+        )
+
+    def _full_downloads(self):
+        return [
+            x
+            for x in self.requests_mocker.request_history
+            if '/submission/' in x.url and 'list_only' not in x.qs
+        ]
+
+    def test_collect_update_unchanged(self):
+        self.num_submissions = 1
+        self._mock_requests_collect()
+        self.collect.start()
+        notebook = self.submission_dir() / (self.notebook_id + '.ipynb')
+        mtime = os.path.getmtime(notebook)
+        self.num_submissions = 2
+        self.collect.update = True
+        self.requests_mocker.reset_mock()
+        self.collect.start()
+        assert self._full_downloads() == []
+        assert os.path.getmtime(notebook) == mtime
+        timestamp_path = self.submission_dir() / 'timestamp.txt'
+        assert timestamp_path.read_text() == '2002' + self.timestamp_template
+        assert self.collect.submission_counts == {'processed': 1}
+
+    def test_collect_update_changed(self):
+        self.num_submissions = 1
+        self._mock_requests_collect()
+        self.collect.start()
+        notebook = self.submission_dir() / (self.notebook_id + '.ipynb')
+        notebook.write_text('changed')
+        removed = self.submission_dir() / 'foo' / 'removed.txt'
+        removed.parent.mkdir()
+        removed.write_text('removed')
+        self.num_submissions = 2
+        self.collect.update = True
+        self.requests_mocker.reset_mock()
+        self.collect.start()
+        assert len(self._full_downloads()) == 1
+        assert notebook.read_bytes() == self._notebook_content()
+        assert not removed.parent.exists()
+        timestamp_path = self.submission_dir() / 'timestamp.txt'
+        assert timestamp_path.read_text() == '2002' + self.timestamp_template
+
+    def test_collect_update_staged(self):
+        self.num_submissions = 1
+        self._mock_requests_collect()
+        self.collect.start()
+        notebook = self.submission_dir() / (self.notebook_id + '.ipynb')
+        notebook.write_text('changed')
+        self.num_submissions = 2
+        self.collect.update = True
+        deleted = []
+        with patch.object(exchange, '_delete_dirs', deleted.extend):
+            self.collect.start()
+            self._join_cleanup()
+        assert notebook.read_bytes() == self._notebook_content()
+        # The replaced submission is kept as a whole until it is deleted.
+        assert len(deleted) == 1
+        old_path = Path(deleted[0])
+        assert old_path.parent == self.submission_dir().parent
+        assert old_path.name.startswith('.{}.old-'.format(self.assignment_id))
+        assert (old_path / notebook.name).read_text() == 'changed'
+
+        # Left over replaced submissions are deleted by the next collect once
+        # their collect is not running anymore.
+        self.num_submissions = 3
+        self.collect.start()
+        self._join_cleanup()
+        assert old_path.is_dir()
+        with patch.object(collect, '_process_alive', lambda pid: False):
+            self.collect.start()
+            self._join_cleanup()
+        assert os.listdir(self.submission_dir().parent) == [self.assignment_id]
+
+    def _join_cleanup(self):
+        for thread in self.collect._cleanup_threads:
+            thread.join()
+
+    def test_collect_leftovers_deleted(self):
+        self.num_submissions = 1
+        self._mock_requests_collect()
+        self.collect.start()
+        parent = self.submission_dir().parent
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        dead = '{}-{}-0'.format(socket.gethostname(), process.pid)
+        staging = parent / '.{}.staging-{}'.format(self.assignment_id, dead)
+        staging.mkdir()
+        (staging / 'partial.ipynb').write_text('partial')
+        (parent / '.{}.old-{}'.format(self.assignment_id, dead)).mkdir()
+        # Nothing is downloaded, but the leftovers are still deleted.
+        self.collect.start()
+        self._join_cleanup()
+        assert self.collect.submission_counts == {'skipped': 1}
+        assert os.listdir(parent) == [self.assignment_id]
+
+    def test_collect_leftovers_concurrent(self):
+        self.num_submissions = 1
+        self._mock_requests_collect()
+        self.collect.start()
+        parent = self.submission_dir().parent
+        # Staged by another collect that is still running.
+        live = parent / '.{}.staging-{}-{}-0'.format(
+            self.assignment_id, socket.gethostname(), os.getpid()
+        )
+        other_host = parent / '.{}.staging-other-host-1-0'.format(
+            self.assignment_id
+        )
+        for path in (live, other_host):
+            path.mkdir()
+            (path / 'partial.ipynb').write_text('partial')
+        self.collect.start()
+        self._join_cleanup()
+        assert (live / 'partial.ipynb').is_file()
+        assert (other_host / 'partial.ipynb').is_file()
+
+        # Unless they have not changed for too long.
+        with patch.object(collect, '_LEFTOVER_SECONDS', -1):
+            self.collect.start()
+            self._join_cleanup()
+        assert os.listdir(parent) == [self.assignment_id]
+
+    def test_collect_update_swap_failed(self):
+        self.num_submissions = 1
+        self._mock_requests_collect()
+        self.collect.start()
+        notebook = self.submission_dir() / (self.notebook_id + '.ipynb')
+        notebook.write_text('changed')
+        self.num_submissions = 2
+        self.collect.update = True
+        rename = os.rename
+
+        def failing_rename(src, dest):
+            if '.staging-' in os.path.basename(src):
+                raise PermissionError()
+            rename(src, dest)
+
+        with patch.object(os, 'rename', failing_rename):
+            self.collect.start()
+        self._join_cleanup()
+        assert self.collect.submission_counts == {'failed': 1}
+        assert notebook.read_text() == 'changed'
+        assert os.listdir(self.submission_dir().parent) == [self.assignment_id]
+
+    def test_collect_update_failed_staged(self):
+        self.num_submissions = 1
+        self._mock_requests_collect()
+        self.collect.start()
+        notebook = self.submission_dir() / (self.notebook_id + '.ipynb')
+        notebook.write_text('changed')
+        self.num_submissions = 2
+        self.collect.update = True
+        url = '{}/submission/{}/{}/{}'.format(
+            self.base_url, self.course_id, self.assignment_id, self.student_id
+        )
+        self.requests_mocker.get(
+            url,
+            [
+                {'json': self._get_submission},
+                {'status_code': 404},
+            ],
+        )
+        self.collect.start()
+        assert self.collect.submission_counts == {'failed': 1}
+        assert notebook.read_text() == 'changed'
+        assert os.listdir(self.submission_dir().parent) == [self.assignment_id]
+
+    def _mock_assignments(self, assignment_ids):
+        url = '{}/assignments/{}'.format(self.base_url, self.course_id)
+        self.requests_mocker.get(
+            url, json={'success': True, 'assignments': assignment_ids}
+        )
+        for assignment_id in assignment_ids:
+            url = '{}/submissions/{}/{}'.format(
+                self.base_url, self.course_id, assignment_id
+            )
+            self.requests_mocker.get(url, json=self._get_submissions)
+            url = '{}/submission/{}/{}/{}'.format(
+                self.base_url, self.course_id, assignment_id, self.student_id
+            )
+            self.requests_mocker.get(url, json=self._get_submission)
+
+    def test_collect_all_assignments(self):
+        self.num_submissions = 1
+        assignment_ids = [self.assignment_id, 'ps2', 'ps3']
+        self._mock_assignments(assignment_ids)
+        self.collect.coursedir.assignment_id = '*'
+        self.collect.start()
+        for assignment_id in assignment_ids:
+            assert (
+                self.course_dir
+                / 'submitted'
+                / self.student_id
+                / assignment_id
+                / (self.notebook_id + '.ipynb')
+            ).is_file()
+        assert self.collect.submission_counts == {'processed': 3}
+        self.assert_request_budget(
+            {
+                'GET /assignments/{course}': 1,
+                'GET /submissions/{course}/{assignment}': 3,
+                'GET /submission/{course}/{assignment}/{student}': 3,
+            }
+        )
+
+    def test_collect_assignment_list(self, caplog):
+        caplog.set_level(logging.INFO)
+        self.num_submissions = 1
+        self._mock_assignments([self.assignment_id, 'ps2', 'ps3'])
+        self.collect.coursedir.assignment_id = 'ps3, {}'.format(
+            self.assignment_id
+        )
+        self.collect.start()
+        submitted = self.course_dir / 'submitted' / self.student_id
+        assert sorted(os.listdir(submitted)) == [self.assignment_id, 'ps3']
+        messages = [
+            x.getMessage()
+            for x in caplog.records
+            if x.getMessage().startswith('Processing')
+        ]
+        assert messages == [
+            'Processing 1 submissions of "{}" for course "{}"'.format(
+                x, self.course_id
+            )
+            for x in ['ps3', self.assignment_id]
+        ]
+        self.assert_request_budget(
+            {
+                'GET /submissions/{course}/{assignment}': 2,
+                'GET /submission/{course}/{assignment}/{student}': 2,
+            }
+        )
+
+    def test_collect_assignment_list_error(self):
+        self.num_submissions = 1
+        self._mock_assignments([self.assignment_id])
+        self.collect.coursedir.assignment_id = '{},ps2'.format(
+            self.assignment_id
+        )
+        self.collect.start()
+        assert self.collect.submission_counts == {'processed': 1}
+
+    def test_collect_streamed(self):
+        self.num_submissions = 1
+        self._mock_requests_collect()
+        with patch.object(exchange, 'STREAM_CHUNK_SIZE', 7):
+            self.collect.start()
+        notebook = self.submission_dir() / (self.notebook_id + '.ipynb')
+        assert notebook.read_bytes() == self._notebook_content()
+        timestamp_path = self.submission_dir() / 'timestamp.txt'
+        assert timestamp_path.read_text() == '2001' + self.timestamp_template
+        received = self.collect.metrics.summary()['total']['bytes_received']
+        assert received > len(self._notebook_content())
+
+    def test_collect_truncated(self):
+        self.num_submissions = 1
+        self._mock_requests_collect()
+        url = '{}/submission/{}/{}/{}'.format(
+            self.base_url, self.course_id, self.assignment_id, self.student_id
+        )
+        content = base64.b64encode(self._notebook_content()).decode()
+        body = json.dumps(
+            {
+                'success': True,
+                'timestamp': '2001' + self.timestamp_template,
+                'files': [{'path': 'p1.ipynb', 'content': content}],
+            }
+        )
+        self.requests_mocker.get(url, text=body[: len(body) // 2])
+        self.collect.start()
+        assert self.collect.submission_counts == {'failed': 1}
+        assert not self.submission_dir().exists()
+        assert os.listdir(self.submission_dir().parent) == []
+
+    def test_decode_files(self, tmp_path):
+        files = [
+            {'content': base64.encodebytes(b'a' * 100).decode(), 'path': 'a'},
+            {'path': 'sub/b"é', 'content': base64.b64encode(b'b').decode()},
+            {'path': 'c', 'content': base64.b64encode(b'c').decode()},
+        ]
+        body = json.dumps(
+            {'files': files, 'timestamp': 't', 'extra': [1, {'x': None}]}
+        ).encode()
+        chunks = [body[i : i + 3] for i in range(0, len(body), 3)]
+        decoded = []
+        result = decode_files(
+            chunks,
+            str(tmp_path),
+            include=lambda path: path != 'c',
+            on_file=lambda path, size: decoded.append((path, size)),
+        )
+        assert result == {
+            'files': [
+                {'path': 'a', 'size': 100},
+                {'path': 'sub/b"é', 'size': 1},
+                {'path': 'c', 'size': 1},
+            ],
+            'timestamp': 't',
+            'extra': [1, {'x': None}],
+        }
+        assert (tmp_path / 'a').read_bytes() == b'a' * 100
+        assert (tmp_path / 'sub' / 'b"é').read_bytes() == b'b'
+        assert sorted(os.listdir(tmp_path)) == ['a', 'sub']
+        assert decoded == [
+            (str(tmp_path / 'a'), 100),
+            (str(tmp_path / 'sub' / 'b"é'), 1),
+        ]
+        with pytest.raises(ValueError):
+            decode_files([body[:-1]], str(tmp_path))
+
+    def test_decode_files_escaped(self, tmp_path):
+        content = bytes(range(256)) * 4
+        path = 'd\\e/\u00e9\U0001f600\n"'
+        body = json.dumps(
+            {
+                'files': [
+                    {
+                        'path': path,
+                        'content': base64.encodebytes(content).decode(),
+                    }
+                ]
+            }
+        ).encode()
+        for size in range(1, 8):
+            chunks = [body[i : i + size] for i in range(0, len(body), size)]
+            dest_dir = tmp_path / str(size)
+            with patch.object(json_stream, 'DECODE_BUFFER_SIZE', 10):
+                result = decode_files(chunks, str(dest_dir))
+            assert result == {'files': [{'path': path, 'size': len(content)}]}
+            assert (dest_dir / path).read_bytes() == content
+        with pytest.raises(ValueError):
+            decode_files(
+                [b'{"files": [{"path": "\\x", "content": ""}]}'], str(tmp_path)
+            )
@@ -54,12 +54,15 @@ class TestCourseManagement:
     bad_user_warning_message = 'The following usernames have upper-case letters. Normally JupyterHub forces usernames to be lowercase. If the user has trouble accessing the course, you should add their lowercase username to ngshare instead.'
 
     @pytest.fixture(autouse=True)
-    def init(self, requests_mock: Mocker):
+    def init(self, requests_mock: Mocker, monkeypatch, tmp_path_factory):
         self.requests_mocker = requests_mock
         requests_mock.register_uri(
             rq_mock.ANY, rq_mock.ANY, text=self._mock_all
         )
         cm._ngshare_url = NGSHARE_URL
+        url_cache = tmp_path_factory.mktemp('url_cache') / 'url_cache.json'
+        monkeypatch.setattr(cm, 'url_cache_path', lambda: str(url_cache))
+        monkeypatch.delenv(cm.NGSHARE_URL_ENV, raising=False)
 
     def _add_gradebook(self, path):
         gb_path = Path(__file__).parent / 'files' / 'gradebook.db'
@@ -696,6 +699,50 @@ class TestCourseManagement:
         with pytest.raises(SystemExit):
             cm.ngshare_url()
 
+    def test_ngshare_url_env(self, monkeypatch):
+        url = 'http://ngshare.env'
+        monkeypatch.setenv(cm.NGSHARE_URL_ENV, url)
+        del cm._ngshare_url
+        assert url == cm.ngshare_url()
+
+    def _write_url_config(self, tmp_dir, url):
+        config = '\n'.join(
+            [
+                'from ngshare_exchange import configureExchange',
+                'c=get_config()',
+                'configureExchange(c, "{}")',
+            ]
+        ).format(url)
+        (Path(tmp_dir) / 'nbgrader_config.py').write_text(config)
+
+    def test_ngshare_url_cached(self, tmp_path_factory, monkeypatch):
+        url = 'http://ngshare.url'
+        tmp_dir = tmp_path_factory.mktemp(self.course_id)
+        os.chdir(tmp_dir)
+        self._write_url_config(tmp_dir, url)
+        del cm._ngshare_url
+        assert url == cm.ngshare_url()
+
+        def fail():
+            assert False, 'nbgrader config was loaded again'
+
+        monkeypatch.setattr('nbgrader.apps.NbGrader', fail)
+        del cm._ngshare_url
+        assert url == cm.ngshare_url()
+
+    def test_ngshare_url_cache_invalidated(self, tmp_path_factory):
+        tmp_dir = tmp_path_factory.mktemp(self.course_id)
+        os.chdir(tmp_dir)
+        self._write_url_config(tmp_dir, 'http://old.url')
+        del cm._ngshare_url
+        assert 'http://old.url' == cm.ngshare_url()
+        self._write_url_config(tmp_dir, 'http://new.url')
+        config_file = Path(tmp_dir) / 'nbgrader_config.py'
+        mtime = config_file.stat().st_mtime_ns + 1000000000
+        os.utime(config_file, ns=(mtime, mtime))
+        del cm._ngshare_url
+        assert 'http://new.url' == cm.ngshare_url()
+
     def test_headers_delete(self):
         token = 'unique_token'
         os.environ['JUPYTERHUB_API_TOKEN'] = token
@@ -1,8 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
+import pstats
 from pathlib import Path
 import os
 from shutil import copyfile
+import threading
+import time
+import tracemalloc
 
 from jupyter_core.paths import jupyter_data_dir
 from nbgrader.exchange import ExchangeError
@@ -12,9 +17,11 @@ from _pytest.logging import LogCaptureFixture
 import pytest
 
 from .. import Exchange
+from ..atomic import atomic_write
+from ..exchange import _session
+from ..hooks import ExchangeHook
 from .base import TestExchange
 
-
 default_cache = None
 
 
@@ -44,6 +51,24 @@ class TestExchangeClass(TestExchange):
         response = requests.get(url)
         return response
 
+    def _new_dummy_action(self):
+        class ExchangeDummy(Exchange):
+            def init_src(self):
+                pass
+
+            def init_dest(self):
+                pass
+
+            def copy_files(self):
+                self.ngshare_api_get('/courses')
+
+        self.requests_mocker.get(
+            self.base_url + '/courses', json={'success': True}
+        )
+        return self._new_exchange_object(
+            ExchangeDummy, self.course_id, self.assignment_id, self.student_id
+        )
+
     def _new_exchange(
         self,
         course_id=TestExchange.course_id,
@@ -124,6 +149,267 @@ class TestExchangeClass(TestExchange):
         response = self.exchange.ngshare_api_get('')
         assert response is None
 
+    def test_metrics(self):
+        url = '{}/submission/{}/{}/{}'.format(
+            self.exchange.ngshare_url,
+            self.course_id,
+            self.assignment_id,
+            self.student_id,
+        )
+        self.requests_mocker.get(url, json={'success': True})
+        self.requests_mocker.post(url, status_code=403, json={'success': True})
+        path = '/submission/{}/{}/{}'.format(
+            self.course_id, self.assignment_id, self.student_id
+        )
+        self.exchange.ngshare_api_get(path)
+        self.exchange.ngshare_api_get(path)
+        self.exchange.ngshare_api_post(path, {'files': 'abc'})
+        summary = self.exchange.metrics.summary()
+        template = '/submission/{course}/{assignment}/{student}'
+        get_stats = summary['endpoints']['GET ' + template]
+        post_stats = summary['endpoints']['POST ' + template]
+        assert get_stats['count'] == 2
+        assert get_stats['status_codes'] == {200: 2}
+        assert sum(get_stats['latency_histogram']) == 2
+        assert get_stats['bytes_received'] > 0
+        assert post_stats['errors'] == 1
+        assert post_stats['bytes_sent'] == len('files=abc')
+        assert summary['total']['requests'] == 3
+
+    def test_metrics_exception(self):
+        url = self.exchange.ngshare_url + '/courses'
+        self.requests_mocker.get(url, exc=requests.exceptions.ConnectionError)
+        self.exchange.ngshare_api_get('/courses')
+        stats = self.exchange.metrics.summary()['endpoints']['GET /courses']
+        assert stats['status_codes'] == {'error': 1}
+
+    def test_metrics_encoded_bytes(self):
+        assignment_dir = self.course_dir / self.assignment_id
+        assignment_dir.mkdir()
+        (assignment_dir / 'p1.ipynb').write_bytes(b'12345')
+        self.exchange.encode_dir(assignment_dir)
+        total = self.exchange.metrics.summary()['total']
+        assert total['file_bytes'] == 5
+        assert total['base64_bytes'] == 8
+
+    def test_log_request_metrics(self, caplog: LogCaptureFixture):
+        caplog.set_level(logging.INFO)
+        exchange = self._new_dummy_action()
+        exchange.start()
+        assert 'ngshare request metrics' not in caplog.text
+        exchange.log_request_metrics = True
+        exchange.start()
+        assert 'ngshare request metrics' in caplog.text
+
+    def test_trace_output(self, tmp_path):
+        exchange = self._new_dummy_action()
+        exchange.trace_output = str(tmp_path)
+        exchange.start()
+        traces = list(tmp_path.iterdir())
+        assert len(traces) == 1
+        assert traces[0].name.startswith(
+            'dummy-{}-{}-'.format(self.course_id, self.assignment_id)
+        )
+        events = json.loads(traces[0].read_text())['traceEvents']
+        names = [event['name'] for event in events]
+        assert 'dummy' in names
+        assert 'GET /courses' in names
+        assert all(event['ph'] == 'X' for event in events)
+
+    def test_no_trace_output(self):
+        assert not self.exchange.tracer.enabled
+
+    def test_map_concurrent(self):
+        self.exchange.max_concurrent_requests = 4
+        thread_names = set()
+
+        def square(x):
+            thread_names.add(threading.current_thread().name)
+            time.sleep(0.01 * (10 - x))
+            return x * x
+
+        assert self.exchange.map_concurrent(square, range(10)) == [
+            x * x for x in range(10)
+        ]
+        assert all(name.startswith('ngshare') for name in thread_names)
+
+    def test_map_concurrent_exception(self):
+        self.exchange.max_concurrent_requests = 4
+        calls = []
+
+        def check(x):
+            calls.append(x)
+            if x % 3 == 2:
+                raise ValueError(x)
+
+        with pytest.raises(ValueError) as e:
+            self.exchange.map_concurrent(check, range(6))
+        assert e.value.args == (2,)
+        assert sorted(calls) == list(range(6))
+
+    def test_map_concurrent_serial(self):
+        self.exchange.max_concurrent_requests = 1
+        thread_names = []
+        self.exchange.map_concurrent(
+            lambda x: thread_names.append(threading.current_thread().name),
+            range(3),
+        )
+        assert thread_names == [threading.current_thread().name] * 3
+
+    def test_session_per_thread(self):
+        session = _session()
+        assert _session() is session
+        with ThreadPoolExecutor(1) as executor:
+            assert executor.submit(_session).result() is not session
+
+    def test_atomic_write(self, tmp_path):
+        path = tmp_path / 'file.json'
+        path.write_text('old')
+        with pytest.raises(ValueError):
+            with atomic_write(str(path)) as f:
+                f.write('partial')
+                raise ValueError()
+        assert path.read_text() == 'old'
+        assert os.listdir(str(tmp_path)) == ['file.json']
+        with atomic_write(str(path)) as f:
+            f.write('new')
+        assert path.read_text() == 'new'
+        assert os.listdir(str(tmp_path)) == ['file.json']
+
+    def test_atomic_write_mode(self, tmp_path):
+        path = tmp_path / 'file.json'
+        umask = os.umask(0o027)
+        try:
+            with atomic_write(str(path)) as f:
+                f.write('new')
+        finally:
+            os.umask(umask)
+        assert path.stat().st_mode & 0o777 == 0o640
+
+        # The mode of an existing file is kept.
+        for mode in (0o600, 0o664):
+            path.chmod(mode)
+            with atomic_write(str(path)) as f:
+                f.write('new')
+            assert path.stat().st_mode & 0o777 == mode
+
+    def test_profile_output(self, tmp_path):
+        exchange = self._new_dummy_action()
+        exchange.profile_output = str(tmp_path)
+        exchange.start()
+        profiles = list(tmp_path.iterdir())
+        assert len(profiles) == 1
+        assert profiles[0].suffix == '.pstats'
+        stats = pstats.Stats(str(profiles[0]))
+        functions = [name for _, _, name in stats.stats]
+        assert 'copy_files' in functions
+
+    def test_profile_output_threads(self, tmp_path):
+        def profiled_task(item):
+            return item
+
+        exchange = self._new_dummy_action()
+        exchange.copy_files = lambda: exchange.map_concurrent(
+            profiled_task, range(4)
+        )
+        exchange.profile_output = str(tmp_path)
+        exchange.start()
+        profiles = list(tmp_path.iterdir())
+        assert len(profiles) == 1
+        stats = pstats.Stats(str(profiles[0]))
+        calls = {
+            name: ncalls
+            for (_, _, name), (_, ncalls, *_) in stats.stats.items()
+        }
+        assert calls['profiled_task'] == 4
+        assert exchange._worker_profilers is None
+        assert type(exchange.executor) is ThreadPoolExecutor
+        exchange._shutdown_executor()
+
+    def test_tracemalloc_output(self, tmp_path):
+        exchange = self._new_dummy_action()
+        exchange.tracemalloc_output = str(tmp_path)
+        exchange.tracemalloc_top = 3
+        exchange.start()
+        assert not tracemalloc.is_tracing()
+        reports = list(tmp_path.iterdir())
+        assert len(reports) == 1
+        assert reports[0].name.startswith(
+            'dummy-{}-{}-'.format(self.course_id, self.assignment_id)
+        )
+        lines = reports[0].read_text().splitlines()
+        assert lines[0].startswith('current: ')
+        assert len(lines) <= 4
+
+    def test_event_hooks(self):
+        events = []
+
+        class RecordingHook(ExchangeHook):
+            def on_request_end(self, template, status, **kwargs):
+                events.append(('request', template, status))
+
+            def on_phase(self, phase, event, duration):
+                events.append((event, phase))
+
+        exchange = self._new_dummy_action()
+        exchange.event_hooks = [RecordingHook]
+        exchange.start()
+        assert events == [
+            ('start', 'dummy'),
+            ('request', '/courses', 200),
+            ('end', 'dummy'),
+        ]
+
+    def test_event_hooks_file_encoded(self):
+        events = []
+
+        class RecordingHook:
+            def on_file_encoded(self, path, size, encoded_size):
+                events.append((path, size, encoded_size))
+
+        assignment_dir = self.course_dir / self.assignment_id
+        assignment_dir.mkdir()
+        (assignment_dir / 'p1.ipynb').write_bytes(b'12345')
+        self.exchange.register_hook(RecordingHook())
+        self.exchange.encode_dir(assignment_dir)
+        self.exchange.hooks.flush()
+        assert events == [('p1.ipynb', 5, 8)]
+
+    def test_event_hooks_failure(self, caplog: LogCaptureFixture):
+        events = []
+
+        class FailingHook(ExchangeHook):
+            def on_phase(self, **kwargs):
+                raise RuntimeError()
+
+        class RecordingHook(ExchangeHook):
+            def on_phase(self, phase, event, duration):
+                events.append((event, phase))
+
+        exchange = self._new_dummy_action()
+        exchange.register_hook(FailingHook())
+        exchange.register_hook(RecordingHook())
+        exchange.start()
+        assert events == [('start', 'dummy'), ('end', 'dummy')]
+        failures = [
+            x for x in caplog.records if 'Exchange hook' in x.getMessage()
+        ]
+        assert len(failures) == 2
+        assert all(x.exc_info[0] is RuntimeError for x in failures)
+
+    def test_event_hooks_keep_registered(self):
+        events = []
+
+        class RecordingHook(ExchangeHook):
+            def on_phase(self, phase, event, duration):
+                events.append((event, phase))
+
+        exchange = self._new_dummy_action()
+        exchange.register_hook(RecordingHook())
+        exchange.event_hooks = [ExchangeHook]
+        exchange.start()
+        assert events == [('start', 'dummy'), ('end', 'dummy')]
+
     def test_default_cache_dir(self):
         dir = default_cache
         assert Path(dir) == Path(jupyter_data_dir()) / 'nbgrader_cache'
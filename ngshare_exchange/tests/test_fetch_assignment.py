@@ -228,3 +228,7 @@ class TestExchangeFetchAssignment(TestExchange):
             self.fetch_assignment.start()
         except ExchangeError:
             pass
+
+    def test_fetch_request_budget(self):
+        self.fetch_assignment.start()
+        self.assert_request_budget({'GET /assignment/{course}/{assignment}': 1})
@@ -320,3 +320,15 @@ class TestExchangeFetchFeedback(TestExchange):
             self.fetch_feedback.start()
         except ExchangeError:
             pass
+
+    def test_fetch_request_budget(self):
+        num_submissions = 3
+        for i in range(num_submissions):
+            submission_name = '{}+{}+timestamp{}'.format(
+                self.student_id, self.assignment_id, i
+            )
+            os.makedirs(self.cache_dir / self.course_id / submission_name)
+        self.fetch_feedback.start()
+        self.assert_request_budget(
+            {'GET /feedback/{course}/{assignment}/{student}': num_submissions}
+        )
@@ -1,10 +1,14 @@
 import base64
 import hashlib
+import io
+import json
 import logging
 import os
 from pathlib import Path
 import re
 import shutil
+import threading
+from contextlib import redirect_stdout
 
 from _pytest.logging import LogCaptureFixture
 from _pytest.legacypath import TempdirFactory
@@ -12,11 +16,20 @@ import pytest
 from requests import PreparedRequest
 from textwrap import dedent
 from unittest import TestCase
+from unittest.mock import patch
 
 from .base import parse_body, TestExchange
 from nbgrader.auth import Authenticator
 from nbgrader.exchange import ExchangeError
-from .. import ExchangeList
+from .. import (
+    cache_index,
+    checksums,
+    ExchangeFetchAssignment,
+    ExchangeFetchFeedback,
+    ExchangeList,
+)
+from ..list import _group_submissions, _Submission
+from ..list_cache import LIST_RESULTS
 
 
 class TestExchangeList(TestExchange, TestCase):
@@ -623,6 +636,27 @@ class TestExchangeList(TestExchange, TestCase):
         assert not self.test_failed
         assert self.test_completed
 
+    def test_list_remove_outbound_report(self):
+        self.num_assignments = 2
+        self._mock_error_unrelease()
+        url = '{}/assignment/{}/{}'.format(
+            self.base_url, self.course_id, self.assignment_id2
+        )
+        self.requests_mocker.delete(url, json=self._delete_assignment)
+        self.list.coursedir.course_id = self.course_id
+        self.list.remove = True
+        self.list.start()
+        log = self._read_log()
+        assert (
+            '[ERROR] Failed to remove assignment {}/{}.\n'
+            '[INFO] Removed assignment {}/{}.\n'.format(
+                self.course_id,
+                self.assignment_id,
+                self.course_id,
+                self.assignment_id2,
+            )
+        ) in log
+
     def test_list_inbound_0(self):
         self.num_assignments = 1
         self.num_submissions = 0
@@ -793,8 +827,8 @@ class TestExchangeList(TestExchange, TestCase):
             self._read_log()
             == dedent(
                 """
-            [WARNING] No notebooks found for assignment "{}" in course "{}"
             [INFO] Submitted assignments:
+            [WARNING] No notebooks found for assignment "{}" in course "{}"
             [INFO] {} {} {} {} (no feedback available)
             """
             )
@@ -1069,6 +1103,19 @@ class TestExchangeList(TestExchange, TestCase):
             )
         )
 
+    def test_list_remove_cached_trash(self):
+        self._submit()
+        self._submit(timestamp=self.timestamp2)
+        course_cache = self.cache_dir / self.course_id
+        (course_cache / '.trash-1-left-over').mkdir()
+        self.is_instructor = False
+        self.list.cached = True
+        self.list.remove = True
+        self.list.start()
+        self.list._removal_thread.join()
+        assert list(course_cache.iterdir()) == []
+        assert self._read_log().count('[INFO] Removed cached submission') == 2
+
     def test_list_cached_and_inbound(self):
         self.is_instructor = False
         self.list.cached = True
@@ -2130,3 +2177,588 @@ class TestExchangeList(TestExchange, TestCase):
         self.list.coursedir.assignment_id = self.assignment_id
         self.list.remove = True
         self.list.start()
+
+    def test_list_inbound_concurrent(self):
+        self.num_assignments = 1
+        self.num_submissions = 2
+        thread_names = set()
+
+        def get_submission(request, context):
+            thread_names.add(threading.current_thread().name)
+            return self._get_submission(request, context)
+
+        url = '{}/submission/{}/{}/{}'.format(
+            self.base_url, self.course_id, self.assignment_id, self.student_id
+        )
+        self.requests_mocker.get(url, json=get_submission)
+        self.list.coursedir.assignment_id = self.assignment_id
+        self.list.inbound = True
+        self.list.max_concurrent_requests = 2
+        data = self.list.start()
+        assert [x['timestamp'] for x in data[0]['submissions']] == [
+            self.timestamp1,
+            self.timestamp2,
+        ]
+        assert all(name.startswith('ngshare') for name in thread_names)
+
+    def test_list_inbound_serial(self):
+        self.num_assignments = 1
+        self.num_submissions = 2
+        self.list.coursedir.assignment_id = self.assignment_id
+        self.list.inbound = True
+        data = self.list.start()
+        serial_list = self._new_list()
+        serial_list.coursedir.assignment_id = self.assignment_id
+        serial_list.inbound = True
+        serial_list.max_concurrent_requests = 1
+        assert serial_list.start() == data
+
+    def test_list_released_prefetch(self):
+        self.num_courses = 2
+        self.num_assignments = 2
+        thread_names = []
+
+        def get_assignment(request, context):
+            thread_names.append(threading.current_thread().name)
+            return self._get_assignment(request, context)
+
+        for course_id in (self.course_id, self.course_id2):
+            for assignment_id in (self.assignment_id, self.assignment_id2):
+                url = '{}/assignment/{}/{}'.format(
+                    self.base_url, course_id, assignment_id
+                )
+                self.requests_mocker.get(url, json=get_assignment)
+        serial_list = self._new_list()
+        serial_list.coursedir.course_id = '*'
+        serial_list.coursedir.assignment_id = '*'
+        serial_list.max_concurrent_requests = 1
+        serial_data = serial_list.start()
+        assert thread_names == [threading.current_thread().name] * 4
+        thread_names.clear()
+        assert self.list.start() == serial_data
+        assert len(thread_names) == 4
+        assert all(name.startswith('ngshare') for name in thread_names)
+
+    def test_list_feedback_checksum_cache(self):
+        self.num_assignments = 1
+        self.num_submissions = 1
+        self.num_feedback = 1
+        self.list.inbound = True
+        self.list.coursedir.assignment_id = self.assignment_id
+        self._fetch_feedback(
+            self.course_dir, self.course_id, self.assignment_id, self.timestamp1
+        )
+        html_path = (
+            self.course_dir
+            / self.assignment_id
+            / 'feedback'
+            / self.timestamp1
+            / (self.notebook_id + '.html')
+        )
+        # Files modified within the last seconds are not cached.
+        os.utime(html_path, (1000000000, 1000000000))
+        hashed = []
+        file_checksum = checksums.file_checksum
+
+        def counting_checksum(path):
+            hashed.append(path)
+            return file_checksum(path)
+
+        with patch.object(checksums, 'file_checksum', counting_checksum):
+            data = self.list.start()
+            assert not data[0]['submissions'][0]['feedback_updated']
+            assert hashed == [str(html_path)]
+            assert (self.cache_dir / '.feedback_checksums.json').is_file()
+
+            self.list.start()
+            assert hashed == [str(html_path)]
+
+            html_path.write_text('modified')
+            os.utime(html_path, (1000000000, 1000000000))
+            data = self.list.start()
+            assert data[0]['submissions'][0]['feedback_updated']
+            assert hashed == [str(html_path)] * 2
+
+    def _released_ids(self, data):
+        return [(x['course_id'], x['assignment_id']) for x in data]
+
+    def test_list_result_cache(self):
+        LIST_RESULTS.invalidate(str(self.cache_dir))
+        self.num_assignments = 1
+        self.list.result_cache = True
+        data = self.list.start()
+        assert self._released_ids(data) == [
+            (self.course_id, self.assignment_id)
+        ]
+        data[0]['status'] = 'modified'
+
+        self.num_assignments = 2
+        cached_list = self._new_list()
+        cached_list.coursedir.course_id = '*'
+        cached_list.coursedir.assignment_id = '*'
+        cached_list.result_cache = True
+        data = cached_list.start()
+        assert self._released_ids(data) == [
+            (self.course_id, self.assignment_id)
+        ]
+        assert data[0]['status'] == 'released'
+
+        LIST_RESULTS.wait()
+        data = cached_list.start()
+        assert self._released_ids(data) == [
+            (self.course_id, self.assignment_id),
+            (self.course_id, self.assignment_id2),
+        ]
+        LIST_RESULTS.wait()
+
+    def test_list_result_cache_invalidated(self):
+        LIST_RESULTS.invalidate(str(self.cache_dir))
+        self.num_assignments = 1
+        self.list.result_cache = True
+        self.list.start()
+        generation_file = self.cache_dir / '.list_generation'
+        assert generation_file.is_file()
+
+        # Another process fetched an assignment.
+        self.num_assignments = 2
+        generation_file.write_text('other process')
+        data = self.list.start()
+        assert self._released_ids(data) == [
+            (self.course_id, self.assignment_id),
+            (self.course_id, self.assignment_id2),
+        ]
+
+        # An action in this process changed the listed assignments.
+        self.num_assignments = 1
+        self._new_exchange_object(
+            ExchangeFetchAssignment,
+            self.course_id,
+            self.assignment_id,
+            self.student_id,
+        )._invalidate_list_results()
+        data = self.list.start()
+        assert self._released_ids(data) == [
+            (self.course_id, self.assignment_id)
+        ]
+
+    def test_list_result_cache_disabled_no_marker(self):
+        generation_file = self.cache_dir / '.list_generation'
+        if generation_file.exists():
+            generation_file.unlink()
+        self.list.start()
+        self._new_exchange_object(
+            ExchangeFetchAssignment,
+            self.course_id,
+            self.assignment_id,
+            self.student_id,
+        )._invalidate_list_results()
+        assert not generation_file.exists()
+
+    def _init_cached_feedback(self):
+        self.num_assignments = 1
+        self.num_submissions = 2
+        self.num_feedback = 1
+        self._submit()
+        self._submit(timestamp=self.timestamp2)
+        self._fetch_feedback(
+            self.course_dir, self.course_id, self.assignment_id, self.timestamp1
+        )
+        self.is_instructor = False
+        self.list.cached = True
+        self.list.coursedir.assignment_id = self.assignment_id
+
+    def test_list_cached_feedback_prefetch(self):
+        self._init_cached_feedback()
+        thread_names = []
+
+        def get_feedback(request, context):
+            thread_names.append(threading.current_thread().name)
+            return self._get_feedback(request, context)
+
+        url = '{}/feedback/{}/{}/{}'.format(
+            self.base_url, self.course_id, self.assignment_id, self.student_id
+        )
+        self.requests_mocker.get(url, json=get_feedback)
+        self.list.feedback_memo_ttl = 0
+        data = self.list.start()
+        assert len(thread_names) == 2
+        assert all(name.startswith('ngshare') for name in thread_names)
+        self.list.max_concurrent_requests = 1
+        assert self.list.start() == data
+
+    def test_list_cached_feedback_memo(self):
+        self._init_cached_feedback()
+        data = self.list.start()
+        assert not (self.cache_dir / '.feedback_memo.json').exists()
+
+        self.list.feedback_memo_ttl = 600
+        data = self.list.start()
+        assert (self.cache_dir / '.feedback_memo.json').is_file()
+
+        # Only the submission without fetched feedback is checked again.
+        self.requests_mocker.reset_mock()
+        assert self.list.start() == data
+        assert (
+            self.count_requests()[
+                'GET /feedback/{course}/{assignment}/{student}'
+            ]
+            == 1
+        )
+
+        self.requests_mocker.reset_mock()
+        self.list.feedback_memo_ttl = 0
+        assert self.list.start() == data
+        assert (
+            self.count_requests()[
+                'GET /feedback/{course}/{assignment}/{student}'
+            ]
+            == 2
+        )
+
+    def test_list_cached_feedback_memo_local_changed(self):
+        self._init_cached_feedback()
+        self.list.feedback_memo_ttl = 600
+        data = self.list.start()
+        submission = data[0]['submissions'][0]
+        assert not submission['feedback_updated']
+
+        # Feedback fetched again locally differs from the memoized one.
+        html_path = Path(submission['local_feedback_path']) / '{}.html'.format(
+            self.notebook_id
+        )
+        html_path.write_text('fetched again')
+        self.requests_mocker.reset_mock()
+        data = self.list.start()
+        assert data[0]['submissions'][0]['feedback_updated']
+        assert (
+            self.count_requests()[
+                'GET /feedback/{course}/{assignment}/{student}'
+            ]
+            == 2
+        )
+
+    def test_list_cached_feedback_memo_forgotten(self):
+        self._init_cached_feedback()
+        self.list.feedback_memo_ttl = 600
+        self.list.start()
+        memo_path = self.cache_dir / '.feedback_memo.json'
+        assert len(json.loads(memo_path.read_text())) == 1
+
+        self._new_exchange_object(
+            ExchangeFetchFeedback,
+            self.course_id,
+            self.assignment_id,
+            self.student_id,
+        )._forget_feedback_memo(self.course_id, '*', self.student_id)
+        assert json.loads(memo_path.read_text()) == {}
+
+    def test_list_cached_index(self):
+        self.num_assignments = 1
+        self._submit()
+        self._submit(timestamp=self.timestamp2)
+        self.is_instructor = False
+        self.list.cached = True
+        data = self.list.start()
+        index_path = self.cache_dir / '.index.sqlite3'
+        assert index_path.is_file()
+        assert [len(x['submissions']) for x in data] == [2]
+
+        list_notebooks = cache_index._list_notebooks
+        listed = []
+
+        def counting_list_notebooks(path):
+            listed.append(path)
+            return list_notebooks(path)
+
+        with patch.object(
+            cache_index, '_list_notebooks', counting_list_notebooks
+        ):
+            assert self.list.start() == data
+            assert listed == []
+
+            shutil.rmtree(data[0]['submissions'][0]['path'])
+            data = self.list.start()
+            assert [len(x['submissions']) for x in data] == [1]
+            assert listed == []
+
+            index_path.unlink()
+            assert self.list.start() == data
+            assert listed == [data[0]['submissions'][0]['path']]
+
+    def test_list_cached_index_racy(self):
+        self.num_assignments = 1
+        self._submit()
+        self.is_instructor = False
+        self.list.cached = True
+        data = self.list.start()
+        assert [len(x['submissions']) for x in data] == [1]
+
+        # A submission added within the resolution of the course directory's
+        # modification time is still found.
+        course_dir = self.cache_dir / self.course_id
+        mtime_ns = course_dir.stat().st_mtime_ns
+        path = Path(data[0]['submissions'][0]['path'])
+        shutil.copytree(
+            str(path), str(path.with_name(path.name + '0')), symlinks=True
+        )
+        os.utime(str(course_dir), ns=(mtime_ns, mtime_ns))
+        data = self.list.start()
+        assert [len(x['submissions']) for x in data] == [2]
+
+    def test_list_cached_no_cache_dir(self):
+        cache_dir = self.course_dir / 'new_cache'
+        self.is_instructor = False
+        self.list.cached = True
+        self.list.cache = str(cache_dir)
+        assert self.list.start() == []
+        assert not cache_dir.exists()
+
+    def test_list_iter_assignments(self):
+        self.num_assignments = 2
+        self._submit()
+        self._submit(assignment_id=self.assignment_id2)
+        self.is_instructor = False
+        self.list.cached = True
+        # Feedback is otherwise prefetched for all submissions.
+        self.list.max_concurrent_requests = 1
+        self.list.init_src()
+        self.list.init_dest()
+        assignments = self.list.iter_assignments()
+        first = next(assignments)
+        assert first['assignment_id'] == self.assignment_id
+        assert (
+            self.count_requests()[
+                'GET /feedback/{course}/{assignment}/{student}'
+            ]
+            == 1
+        )
+        second = next(assignments)
+        assert second['assignment_id'] == self.assignment_id2
+        assert list(assignments) == []
+        assert self.list.parse_assignments() == [first, second]
+
+    def test_list_ndjson(self):
+        self.num_courses = 2
+        self.num_assignments = 2
+        self.list.output_format = 'ndjson'
+        output = io.StringIO()
+        with redirect_stdout(output):
+            data = self.list.start()
+        lines = output.getvalue().splitlines()
+        assert [json.loads(line) for line in lines] == data
+        assert len(data) == 4
+        assert self._read_log() == ''
+
+    def test_group_submissions(self):
+        def submission(course_id, student_id, timestamp):
+            return {
+                'course_id': course_id,
+                'student_id': student_id,
+                'assignment_id': self.assignment_id,
+                'timestamp': timestamp,
+                'status': 'submitted',
+            }
+
+        a2 = submission(self.course_id2, self.student_id, self.timestamp2)
+        b1 = submission(self.course_id, 'student_2', self.timestamp1)
+        a1 = submission(self.course_id2, self.student_id, self.timestamp1)
+        c2 = submission(self.course_id, self.student_id, self.timestamp2)
+        groups = _group_submissions([a2, b1, a1, c2])
+        assert [
+            (x['course_id'], x['student_id'], x['submissions']) for x in groups
+        ] == [
+            (self.course_id, self.student_id, [c2]),
+            (self.course_id, 'student_2', [b1]),
+            (self.course_id2, self.student_id, [a1, a2]),
+        ]
+
+    def test_list_released_request_budget(self):
+        self.num_courses = 2
+        self.num_assignments = 2
+        self.list.start()
+        self.assert_request_budget(
+            {
+                'GET /courses': 1,
+                'GET /assignments/{course}': self.num_courses,
+                'GET /assignment/{course}/{assignment}': (
+                    self.num_courses * self.num_assignments
+                ),
+            }
+        )
+
+    def test_list_inbound_request_budget(self):
+        self.num_assignments = 1
+        self.num_submissions = 2
+        self.list.coursedir.assignment_id = self.assignment_id
+        self.list.inbound = True
+        self.list.start()
+        self.assert_request_budget(
+            {
+                'GET /courses': 1,
+                'GET /submissions/{course}/{assignment}': 1,
+                'GET /submission/{course}/{assignment}/{student}': (
+                    self.num_submissions
+                ),
+                'GET /feedback/{course}/{assignment}/{student}': (
+                    self.num_submissions
+                ),
+            }
+        )
+
+    def test_list_inbound_cursor(self):
+        self.num_assignments = 1
+        self.num_submissions = 1
+        self.list.coursedir.assignment_id = self.assignment_id
+        self.list.inbound = True
+        self.list.start()
+
+        self.num_submissions = 2
+        self.num_feedback = 2
+        self.requests_mocker.reset_mock()
+        data = self.list.start()
+        self.assert_request_budget(
+            {
+                'GET /courses': 1,
+                'GET /submissions/{course}/{assignment}': 1,
+                'GET /submission/{course}/{assignment}/{student}': 1,
+                'GET /feedback/{course}/{assignment}/{student}': 2,
+            }
+        )
+        submissions = data[0]['submissions']
+        assert [x['timestamp'] for x in submissions] == [
+            self.timestamp1,
+            self.timestamp2,
+        ]
+        assert all(x['has_exchange_feedback'] for x in submissions)
+
+        self.requests_mocker.reset_mock()
+        assert self.list.start() == data
+        self.assert_request_budget(
+            {
+                'GET /courses': 1,
+                'GET /submissions/{course}/{assignment}': 1,
+                'GET /feedback/{course}/{assignment}/{student}': 2,
+            }
+        )
+
+    def test_list_cached_request_budget(self):
+        self.num_assignments = 1
+        self._submit()
+        self._submit(timestamp=self.timestamp2)
+        self.is_instructor = False
+        self.list.cached = True
+        self.list.coursedir.assignment_id = self.assignment_id
+        self.list.start()
+        self.assert_request_budget(
+            {
+                'GET /courses': 1,
+                'GET /feedback/{course}/{assignment}/{student}': 2,
+            }
+        )
+
+    def test_list_remove_request_budget(self):
+        self.num_assignments = 2
+        self.list.coursedir.course_id = self.course_id
+        self.list.remove = True
+        self.list.start()
+        self.assert_request_budget(
+            {
+                'GET /assignments/{course}': 1,
+                'GET /assignment/{course}/{assignment}': 2,
+                'DELETE /assignment/{course}/{assignment}': 2,
+            }
+        )
+
+    def test_list_released_summary(self):
+        self.num_courses = 2
+        self.num_assignments = 2
+        self._fetch(self.course_dir)
+        self.list.notebooks = False
+        data = self.list.start()
+        self.assert_request_budget(
+            {'GET /courses': 1, 'GET /assignments/{course}': self.num_courses}
+        )
+        assert [x['status'] for x in data] == [
+            'fetched',
+            'released',
+            'fetched',
+            'released',
+        ]
+        assert all('notebooks' not in x for x in data)
+
+        self.requests_mocker.reset_mock()
+        info = self.list.load_details(data[1])
+        assert info is data[1]
+        assert info['notebooks'] == [{'notebook_id': self.notebook_id}]
+        self.assert_request_budget({'GET /assignment/{course}/{assignment}': 1})
+
+    def test_list_inbound_summary(self):
+        self.num_assignments = 1
+        self.num_submissions = 2
+        self.num_feedback = 1
+        self.list.coursedir.assignment_id = self.assignment_id
+        self.list.inbound = True
+        detailed = self.list.start()
+
+        self.requests_mocker.reset_mock()
+        self.list.notebooks = False
+        data = self.list.start()
+        self.assert_request_budget(
+            {'GET /courses': 1, 'GET /submissions/{course}/{assignment}': 1}
+        )
+        submissions = data[0]['submissions']
+        assert [x['timestamp'] for x in submissions] == [
+            self.timestamp1,
+            self.timestamp2,
+        ]
+        assert all('notebooks' not in x for x in submissions)
+        assert self._read_log().endswith(
+            '[INFO] {} {} {} {}\n'.format(
+                self.course_id,
+                self.student_id,
+                self.assignment_id,
+                self.timestamp2,
+            )
+        )
+
+        # The notebooks listed before are remembered.
+        self.requests_mocker.reset_mock()
+        for submission in submissions:
+            self.list.load_details(submission)
+        assert data == detailed
+        self.assert_request_budget(
+            {'GET /feedback/{course}/{assignment}/{student}': 2}
+        )
+
+    def test_list_cached_summary(self):
+        self._init_cached_feedback()
+        detailed = self.list.start()
+
+        self.requests_mocker.reset_mock()
+        self.list.notebooks = False
+        data = self.list.start()
+        self.assert_request_budget({'GET /courses': 1})
+        submissions = data[0]['submissions']
+        assert [x['path'] for x in submissions] == [
+            x['path'] for x in detailed[0]['submissions']
+        ]
+        assert all('notebooks' not in x for x in submissions)
+
+        self.requests_mocker.reset_mock()
+        self.list.load_details(submissions[0])
+        assert submissions[0] == detailed[0]['submissions'][0]
+        self.assert_request_budget(
+            {'GET /feedback/{course}/{assignment}/{student}': 1}
+        )
+
+    def test_list_inbound_records(self):
+        self.num_assignments = 1
+        self.num_submissions = 2
+        self.list.coursedir.assignment_id = self.assignment_id
+        self.list.inbound = True
+        data = self.list.start()
+        first, second = self.list.assignments
+        assert isinstance(first, _Submission)
+        assert first.student_id is second.student_id
+        assert first.notebooks[0].notebook_id is second.notebooks[0].notebook_id
+        assert type(data[0]['submissions'][0]) is dict
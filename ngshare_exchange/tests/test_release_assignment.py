@@ -247,3 +247,14 @@ class TestExchangeReleaseAssignment(TestExchange):
 
         assert not self.test_failed
         assert not self.test_completed
+
+    def test_release_request_budget(self):
+        self.released = False
+        self._mock_requests_release()
+        self.release_assignment.start()
+        self.assert_request_budget(
+            {
+                'GET /assignments/{course}': 1,
+                'POST /assignment/{course}/{assignment}': 1,
+            }
+        )
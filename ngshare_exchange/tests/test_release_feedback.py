@@ -174,6 +174,19 @@ class TestExchangeReleaseFeedback(TestExchange):
         assert not self.test_failed
         assert not self.test_completed
 
+    def test_release_exclude_counts(self):
+        feedback_dir = (
+            self.course_dir / 'feedback' / self.student_id / self.assignment_id
+        )
+        shutil.copyfile(
+            feedback_dir / (self.notebook_id + '.html'),
+            feedback_dir / 'other.html',
+        )
+        self.release_feedback.coursedir.student_id_exclude = self.student_id
+        self.release_feedback.start()
+        # Counted once per submission, like released feedback.
+        assert self.release_feedback.submission_counts == {'skipped': 1}
+
     def test_release_bad_assignment_id(self):
         self.feedback_file = 'feedback.html'
         self.timestamp = 'some_timestamp'
@@ -188,3 +201,14 @@ class TestExchangeReleaseFeedback(TestExchange):
         self.release_feedback.start()
         assert not self.test_failed
         assert not self.test_completed
+
+    def test_release_request_budget(self):
+        self.student_id = 'student_2'
+        self._prepare_feedback()
+        self._mock_requests_release()
+        self.student_id = 'student_1'
+        self._mock_requests_release()
+        self.release_feedback.start()
+        self.assert_request_budget(
+            {'POST /feedback/{course}/{assignment}/{student}': 2}
+        )
@@ -6,6 +6,7 @@ import os
 from pathlib import Path
 import re
 import shutil
+from unittest.mock import patch
 
 import pytest
 from requests import PreparedRequest
@@ -13,7 +14,8 @@ import requests_mock as rq_mock
 
 from .base import parse_body, TestExchange
 from nbgrader.exchange import ExchangeError
-from .. import ExchangeSubmit
+from .. import cache_index, ExchangeSubmit
+from ..cache_index import CacheIndex
 
 
 def get_files_path() -> Path:
@@ -252,6 +254,25 @@ class TestExchangeSubmit(TestExchange):
         ) as fh:
             assert fh.read() == cache_timestamp2
 
+    def test_submit_cache_index(self):
+        self._mock_requests_submit()
+        index = CacheIndex(str(self.cache_dir))
+        assert index.submissions(self.course_id) == []
+        self.submit.start()
+        self.timestamp += '_1'
+        self.submit.start()
+
+        with patch.object(cache_index, '_list_notebooks') as list_notebooks:
+            submissions = index.submissions(self.course_id)
+            list_notebooks.assert_not_called()
+        cache_dirs = sorted(
+            str(x) for x in (self.cache_dir / self.course_id).iterdir()
+        )
+        assert submissions == [
+            (x, [os.path.join(x, self.notebook_id + '.ipynb')])
+            for x in cache_dirs
+        ]
+
     def test_submit_extra(self):
         # Add extra notebook.
         self._mock_requests_submit(extra=True)
@@ -393,3 +414,13 @@ class TestExchangeSubmit(TestExchange):
             pass
         assert not self.test_failed
         assert not self.test_completed
+
+    def test_submit_request_budget(self):
+        self._mock_requests_submit()
+        self.submit.start()
+        self.assert_request_budget(
+            {
+                'GET /assignment/{course}/{assignment}': 1,
+                'POST /submission/{course}/{assignment}': 1,
+            }
+        )